@@ -0,0 +1,219 @@
+"""Benchmark language detection and i18n URL reversal."""
+from __future__ import division
+
+import gc
+import json
+import locale
+import platform
+import types
+from optparse import make_option
+from timeit import default_timer
+
+try:
+    import tracemalloc
+except ImportError:  # Python < 3.4.
+    tracemalloc = None
+
+import django
+from django.conf import global_settings, settings
+from django.conf.urls import patterns, url
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse
+from django.core.urlresolvers import resolve, set_urlconf
+from django.template import Context, Template
+from django.test.client import RequestFactory
+from django.test.utils import override_settings
+from django.utils import translation
+from django.utils.importlib import import_module
+
+from i18nurl import middleware, reverse_i18n
+from i18nurl.views import set_language
+
+
+#: Numbers of configured languages.
+LANGUAGE_COUNTS = (2, 10, 50, 200)
+
+#: Accept-Language headers, by complexity.
+ACCEPT_LANGUAGES = {
+    'simple': 'de',
+    'weighted': 'it-CH, it;q=0.9, de;q=0.8, en;q=0.7, *;q=0.5',
+    'long': ', '.join('x%d-yy;q=0.%d' % (i, i % 9 + 1)
+                      for i in range(30)) + ', de;q=0.1',
+    'hostile': ', '.join(['zz-zz;q=0.5'] * 100000),
+}
+
+#: Numbers of patterns in the URLconf.
+URLCONF_SIZES = (10, 100, 1000)
+
+#: Language middlewares, with the request headers they detect language from.
+MIDDLEWARES = (
+    ('UrlPrefixLanguageMiddleware', '/de/startseite/', {}),
+    ('UserLanguageMiddleware', '/', {}),
+    ('SessionLanguageMiddleware', '/', {}),
+    ('CookieLanguageMiddleware', '/', {'HTTP_COOKIE': '%s=de'}),
+    ('HttpAcceptLanguageMiddleware', '/', {}),
+    ('DefaultLanguageMiddleware', '/', {}),
+    ('ChainedLanguageMiddleware', '/', {}),
+)
+
+
+def get_languages(count):
+    """Return settings.LANGUAGES with count languages."""
+    codes = ['fr', 'en', 'de']
+    candidates = [code for code, name in global_settings.LANGUAGES]
+    candidates.extend(sorted(
+        alias.replace('_', '-') for alias in locale.locale_alias
+        if len(alias) == 5 and alias[2] == '_'
+        and alias.replace('_', '').isalpha()))
+    for code in candidates:
+        if len(codes) >= count:
+            break
+        if code not in codes:
+            codes.append(code)
+    return tuple((code, code) for code in codes[:count])
+
+
+def get_urlconf(size):
+    """Return a URLconf module with the demo patterns and size more."""
+    urlconf = types.ModuleType(str('benchmark_urls_%d' % size))
+    demo_urlconf = import_module(settings.ROOT_URLCONF)
+    extra = [url(r'^page-%d/(?P<pk>\d+)/$' % i, 'demoproject.views.reroute',
+                 name='page-%d' % i)
+             for i in range(size - len(demo_urlconf.urlpatterns))]
+    urlconf.urlpatterns = patterns('', *extra) + demo_urlconf.urlpatterns
+    return urlconf
+
+
+class Command(BaseCommand):
+    help = __doc__
+    option_list = BaseCommand.option_list + (
+        make_option('--iterations', type='int', default=1000,
+                    help='Number of runs of each operation.'),
+        make_option('--output', default=None,
+                    help='Path of JSON file to write results to.'),
+    )
+
+    def handle(self, *args, **options):
+        self.iterations = options['iterations']
+        self.factory = RequestFactory()
+        self.results = []
+        for count in LANGUAGE_COUNTS:
+            with override_settings(LANGUAGES=get_languages(count)):
+                self.bench_middlewares(count)
+        for size in URLCONF_SIZES:
+            urlconf = get_urlconf(size)
+            set_urlconf(urlconf)
+            try:
+                self.bench_urls(size)
+            finally:
+                set_urlconf(None)
+        self.bench_set_language()
+        report = {
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'iterations': self.iterations,
+            'results': self.results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2, sort_keys=True)
+
+    def measure(self, name, operation, **params):
+        """Time operation, record and print the result."""
+        operation()  # Warm up caches.
+        start = default_timer()
+        for i in range(self.iterations):
+            operation()
+        duration = default_timer() - start
+        gc.collect()
+        objects = len(gc.get_objects())
+        operation()
+        gc.collect()
+        objects = len(gc.get_objects()) - objects
+        allocated = None
+        if tracemalloc is not None:
+            tracemalloc.start()
+            operation()
+            allocated = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        result = {
+            'name': name,
+            'params': params,
+            'ns_per_op': int(duration * 1e9 / self.iterations),
+            'objects_per_op': objects,
+            'peak_bytes_per_op': allocated,
+        }
+        self.results.append(result)
+        if allocated is None:
+            memory = 'peak bytes unsupported (Python < 3.4)'
+        else:
+            memory = '%d bytes' % allocated
+        self.stdout.write('%s %s: %d ns/op, %d objects/op, %s\n' % (
+            name, params, result['ns_per_op'], objects, memory))
+
+    def get_request(self, path='/', **extra):
+        """Return a GET request as language middlewares expect it."""
+        request = self.factory.get(path, **extra)
+        engine = import_module(settings.SESSION_ENGINE)
+        request.session = engine.SessionStore()
+        request.session['django_language'] = 'de'
+        request.user = AnonymousUser()
+        request.user.language_code = 'de'
+        return request
+
+    def bench_middlewares(self, count):
+        for class_name, path, extra in MIDDLEWARES:
+            extra = dict((key, value % settings.LANGUAGE_COOKIE_NAME)
+                         for key, value in extra.items())
+            for complexity, accept in sorted(ACCEPT_LANGUAGES.items()):
+                if complexity != 'simple' and \
+                        class_name != 'HttpAcceptLanguageMiddleware':
+                    continue
+                instance = getattr(middleware, class_name)()
+                request = self.get_request(path, HTTP_ACCEPT_LANGUAGE=accept,
+                                           **extra)
+                response = HttpResponse()
+
+                def operation():
+                    request.LANGUAGE_CODE = None
+                    instance.process_request(request)
+                    instance.process_response(request, response)
+
+                self.measure(class_name, operation, languages=count,
+                             accept_language=complexity)
+                if hasattr(instance, 'negotiate'):
+                    self.measure(class_name + '.negotiate',
+                                 lambda: instance.negotiate(accept),
+                                 languages=count, accept_language=complexity)
+
+    def bench_urls(self, size):
+        last = 'page-0'
+        with translation.override('de'):
+            request = self.get_request('/de/startseite/')
+            request.resolver_match = resolve('/de/startseite/')
+        self.measure('reverse_i18n', lambda: reverse_i18n('home', 'de'),
+                     urlconf=size, view='home')
+        self.measure('reverse_i18n',
+                     lambda: reverse_i18n(last, 'de', kwargs={'pk': 1}),
+                     urlconf=size, view=last)
+        templates = (
+            ('i18nurl', '{% i18nurl "home" "de" %}'),
+            ('i18nurl', '{% i18nurl "home" language %}'),
+            ('current_i18nurl', '{% current_i18nurl language %}'),
+        )
+        for name, source in templates:
+            template = Template('{% load i18nurl %}' + source)
+            context = Context({'request': request, 'language': 'de'})
+            self.measure(name, lambda: template.render(context),
+                         urlconf=size, template=source)
+
+    def bench_set_language(self):
+        def operation():
+            request = self.factory.post('/i18n/', {'language': 'de'})
+            engine = import_module(settings.SESSION_ENGINE)
+            request.session = engine.SessionStore()
+            request.user = AnonymousUser()
+            set_language(request)
+
+        self.measure('SetLanguageView', operation)
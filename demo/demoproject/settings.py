@@ -66,12 +66,7 @@ MIDDLEWARE_CLASSES = (
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'i18nurl.middleware.UrlPrefixLanguageMiddleware',
-    'i18nurl.middleware.UserLanguageMiddleware',
-    'i18nurl.middleware.SessionLanguageMiddleware',
-    'i18nurl.middleware.CookieLanguageMiddleware',
-    'i18nurl.middleware.HttpAcceptLanguageMiddleware',
-    'i18nurl.middleware.DefaultLanguageMiddleware',
+    'i18nurl.middleware.ChainedLanguageMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
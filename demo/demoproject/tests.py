@@ -1,11 +1,60 @@
 """Unit tests for language automatic and manual selection."""
+import logging
+import os
+import shutil
+import tempfile
+import types
+from multiprocessing import Pool
+
 from django.conf import settings
-from django.core.urlresolvers import reverse
-from django.utils import translation
+from django.contrib.auth import SESSION_KEY
+from django.contrib.auth.models import User
+from django.conf.urls import include, patterns, url
+from django.core.urlresolvers import (NoReverseMatch, clear_url_caches,
+                                      get_resolver, resolve, reverse)
+from django.core.management import call_command
+from django.core.signals import request_finished
+from django.http import HttpResponse
+from django.utils import six, translation
+from django.utils.functional import SimpleLazyObject
 from django.utils.importlib import import_module
+from django.template import Context, Template
 from django.test import TestCase
+from django.test.client import RequestFactory
+from django.test.utils import override_settings
 
+import i18nurl
+import i18nurl.rendering
+import i18nurl.resolvers
+import i18nurl.stores
+import i18nurl.warmup
+from i18nurl import (no_reverse_cache, reverse_cache, reverse_i18n,
+                     reverse_i18n_all, reverse_i18n_isolated, url_cache)
+from i18nurl.backends import (CookieLanguageBackend, SessionLanguageBackend,
+                              UserLanguageBackend, get_backends)
+from i18nurl.cache import LRUCache, get_cache_key
+from i18nurl.instrumentation import LanguageStats
+from i18nurl.negotiation import (LanguageNegotiator, get_negotiator,
+                                 iter_accept_language,
+                                 truncate_accept_language)
+from i18nurl.rendering import render_by_language
+from i18nurl.resolvers import get_language_resolver, warm_resolvers
+from i18nurl.middleware import (ChainedLanguageMiddleware,
+                                HttpAcceptLanguageMiddleware,
+                                UrlPrefixLanguageMiddleware,
+                                UserLanguageMiddleware, cache_user_language)
 from i18nurl.settings import I18N_REDIRECT_URL_NAME
+from i18nurl.sitemaps import _imap_bounded, iter_sitemap, write_sitemaps
+from i18nurl.stores import (CacheLanguageStore, ModelLanguageStore,
+                            get_language_store, get_languages)
+from i18nurl.signals import language_resolved
+from i18nurl.views import guess_language
+from i18nurl.warmup import get_url_names, startup, warmup
+from i18nurl.utils import (activate_language, get_available_languages,
+                           is_language_available, is_language_supported,
+                           override_language)
+
+from .urls import ihm_patterns
 
 
 class I18nTestCase(TestCase):
@@ -81,6 +130,14 @@ class I18nTestCase(TestCase):
 
 class GuessLanguageTestCase(I18nTestCase):
     """Test automatic language detection."""
+    def test_guess_without_middleware(self):
+        """Without language middleware, the guess_language view negotiates
+        the language with HTTP_ACCEPT_LANGUAGE header."""
+        request = RequestFactory().get(self.guess_language_url,
+                                       HTTP_ACCEPT_LANGUAGE='de-ch, en;q=0.5')
+        response = guess_language(request)
+        self.assertEqual(response['Location'], '/de/startseite/')
+
     def test_no_guess(self):
         """Without data to guess (user preferences, session, cookies or
         HTTP_ACCEPT_LANGUAGE header), the guess_language view redirects to
@@ -160,6 +217,38 @@ class GuessLanguageTestCase(I18nTestCase):
             self.assertI18nRedirection(response, redirect_url, error_msg)
 
 
+#: The demo middlewares, with a language middleware per resolver rather than
+#: ChainedLanguageMiddleware.
+STACKED_MIDDLEWARE_CLASSES = (
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'i18nurl.middleware.UrlPrefixLanguageMiddleware',
+    'i18nurl.middleware.UserLanguageMiddleware',
+    'i18nurl.middleware.SessionLanguageMiddleware',
+    'i18nurl.middleware.CookieLanguageMiddleware',
+    'i18nurl.middleware.HttpAcceptLanguageMiddleware',
+    'i18nurl.middleware.DefaultLanguageMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+)
+
+
+@override_settings(MIDDLEWARE_CLASSES=STACKED_MIDDLEWARE_CLASSES)
+class StackedGuessLanguageTestCase(GuessLanguageTestCase):
+    """Test automatic language detection with stacked language
+    middlewares."""
+    def test_vary(self):
+        """Responses vary on the headers of the middlewares asked."""
+        response = self.client.get(self.guess_language_url,
+                                   HTTP_ACCEPT_LANGUAGE=self.other_language)
+        self.assertEqual(response['Vary'], 'Cookie, Accept-Language')
+        response = self.client.get(self.other_redirect_url,
+                                   HTTP_ACCEPT_LANGUAGE=self.other_language)
+        self.assertFalse('Accept-Language' in response.get('Vary', ''))
+
+
 class SetLanguageTestCase(I18nTestCase):
     """Test language change actions."""
     def test_language_list(self):
@@ -216,3 +305,1165 @@ class I18nURLTestCase(I18nTestCase):
             with translation.override(self.other_language):
                 other_url = reverse(view_name)
             self.assertEqual(default_url, other_url)
+
+
+class UrlPrefixLanguageMiddlewareTestCase(TestCase):
+    """Test language detection from URL prefix."""
+    def setUp(self):
+        super(UrlPrefixLanguageMiddlewareTestCase, self).setUp()
+        self.middleware = UrlPrefixLanguageMiddleware()
+        self.factory = RequestFactory()
+
+    def get_language(self, path):
+        request = self.factory.get(path)
+        return self.middleware.get_language_from_request(request)
+
+    def test_prefix(self):
+        """Language is read from the first segment of the path."""
+        self.assertEqual(self.get_language('/de/startseite/'), 'de')
+        self.assertEqual(self.get_language('/en/'), 'en')
+        self.assertEqual(self.get_language('/en'), 'en')
+
+    def test_no_prefix(self):
+        """Paths without a language prefix are ignored."""
+        self.assertEqual(self.get_language('/'), None)
+        self.assertEqual(self.get_language('/english/'), None)
+        self.assertEqual(self.get_language('/i18n/'), None)
+
+    def test_setting_changed(self):
+        """Prefixes are rebuilt when settings.LANGUAGES changes."""
+        with self.settings(LANGUAGES=(('fr', 'French'), ('it', 'Italian'))):
+            self.assertEqual(self.get_language('/it/'), 'it')
+            self.assertEqual(self.get_language('/de/'), None)
+        self.assertEqual(self.get_language('/it/'), None)
+        self.assertEqual(self.get_language('/de/'), 'de')
+
+
+class LRUCacheTestCase(TestCase):
+    """Test the bounded cache used by i18nurl."""
+    def test_eviction(self):
+        """Least recently used items are discarded first."""
+        cache = LRUCache(2)
+        cache.set('fr', 1)
+        cache.set('en', 2)
+        cache.get('fr')
+        cache.set('de', 3)
+        self.assertTrue('fr' in cache)
+        self.assertFalse('en' in cache)
+        self.assertEqual(len(cache), 2)
+
+    def test_counters(self):
+        """Hits and misses are counted until cleared."""
+        cache = LRUCache(2)
+        cache.set('fr', 1)
+        self.assertEqual(cache.get('fr'), 1)
+        self.assertEqual(cache.get('en'), None)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        cache.clear()
+        self.assertEqual((cache.hits, cache.misses, len(cache)), (0, 0, 0))
+
+
+class IsLanguageSupportedTestCase(TestCase):
+    """Test language code normalization."""
+    def test_supported(self):
+        """Codes and their regional variants map to settings.LANGUAGES."""
+        self.assertEqual(is_language_supported('de'), 'de')
+        self.assertEqual(is_language_supported('fr-ca'), 'fr')
+        self.assertEqual(is_language_supported('it'), None)
+        self.assertEqual(is_language_supported(None), None)
+
+    def test_explicit_languages(self):
+        """Supported languages can be given explicitly."""
+        self.assertEqual(is_language_supported('it', ['it']), 'it')
+        self.assertEqual(is_language_supported('de', ['it']), None)
+
+    def test_setting_changed(self):
+        """Memoized results are dropped when settings.LANGUAGES changes."""
+        self.assertEqual(is_language_supported('it'), None)
+        with self.settings(LANGUAGES=(('it', 'Italian'),)):
+            self.assertEqual(is_language_supported('it'), 'it')
+        self.assertEqual(is_language_supported('it'), None)
+
+
+class LanguageUser(object):
+    """Stand-in for a user model with a language_code field."""
+    def __init__(self, language_code):
+        self.language_code = language_code
+
+
+class UserLanguageMiddlewareTestCase(TestCase):
+    """Test caching of the user's language."""
+    def setUp(self):
+        super(UserLanguageMiddlewareTestCase, self).setUp()
+        self.cache_mode = i18nurl.middleware.I18N_USER_LANGUAGE_CACHE
+        self.middleware = UserLanguageMiddleware()
+        self.factory = RequestFactory()
+        self.session = import_module(settings.SESSION_ENGINE).SessionStore()
+        self.user_loads = 0
+
+    def tearDown(self):
+        i18nurl.middleware.I18N_USER_LANGUAGE_CACHE = self.cache_mode
+        super(UserLanguageMiddlewareTestCase, self).tearDown()
+
+    def load_user(self):
+        self.user_loads += 1
+        return LanguageUser('de')
+
+    def get_request(self, user_id=1, **extra):
+        """Return a request with a lazy user, as AuthenticationMiddleware
+        sets it."""
+        request = self.factory.get('/', **extra)
+        request.session = self.session
+        if user_id is not None:
+            request.session[SESSION_KEY] = user_id
+        request.user = SimpleLazyObject(self.load_user)
+        return request
+
+    def test_no_cache(self):
+        """By default, the user is loaded."""
+        i18nurl.middleware.I18N_USER_LANGUAGE_CACHE = None
+        request = self.get_request()
+        self.assertEqual(self.middleware.resolve_language(request),
+                         ('de', False))
+        self.assertEqual(self.user_loads, 1)
+
+    def test_no_session_key(self):
+        """Users not authenticated by the session are loaded, e.g. with
+        RemoteUserMiddleware."""
+        i18nurl.middleware.I18N_USER_LANGUAGE_CACHE = 'store'
+        request = self.get_request(user_id=None)
+        self.assertEqual(self.middleware.resolve_language(request),
+                         ('de', False))
+        self.assertEqual(self.user_loads, 1)
+
+    def test_store(self):
+        """The language is read from the store, which forgets saved
+        users."""
+        i18nurl.middleware.I18N_USER_LANGUAGE_CACHE = 'store'
+        user = User.objects.create(username='store', first_name='en')
+        store = i18nurl.stores._language_store
+        # A stand-in field, auth.User has no language.
+        i18nurl.stores._language_store = CacheLanguageStore(
+            ModelLanguageStore(field='first_name'))
+        i18nurl.stores._language_store.forget([user.pk])
+        try:
+            request = self.get_request(user_id=six.text_type(user.pk))
+            self.assertEqual(self.middleware.resolve_language(request),
+                             ('en', True))
+            user.first_name = 'de'
+            user.save()
+            with self.assertNumQueries(1):
+                self.assertEqual(self.middleware.resolve_language(request),
+                                 ('de', True))
+            with self.assertNumQueries(0):
+                self.assertEqual(self.middleware.resolve_language(request),
+                                 ('de', True))
+        finally:
+            i18nurl.stores._language_store = store
+        self.assertEqual(self.user_loads, 0)
+
+    def test_cookie(self):
+        """The language is cached in a signed cookie by SetLanguageView."""
+        i18nurl.middleware.I18N_USER_LANGUAGE_CACHE = 'cookie'
+        response = HttpResponse()
+        cache_user_language(self.get_request(), response, 'en')
+        cookie = response.cookies['i18nurl_user_language'].value
+        request = self.get_request(
+            HTTP_COOKIE='i18nurl_user_language=%s' % cookie)
+        self.assertEqual(self.middleware.resolve_language(request),
+                         ('en', True))
+        request = self.get_request(
+            HTTP_COOKIE='i18nurl_user_language=1:fr')
+        self.assertEqual(self.middleware.resolve_language(request),
+                         ('de', False))
+        self.assertEqual(self.user_loads, 1)
+
+    def test_cookie_miss(self):
+        """On a miss, the language of the user is set in the cookie."""
+        i18nurl.middleware.I18N_USER_LANGUAGE_CACHE = 'cookie'
+        request = self.get_request()
+        self.middleware.process_request(request)
+        response = self.middleware.process_response(request, HttpResponse())
+        cookie = response.cookies['i18nurl_user_language'].value
+        request = self.get_request(
+            HTTP_COOKIE='i18nurl_user_language=%s' % cookie)
+        self.assertEqual(self.middleware.resolve_language(request),
+                         ('de', True))
+        self.assertEqual(self.user_loads, 1)
+
+
+class LanguageModelUser(LanguageUser):
+    """Stand-in for a saved user with a language_code field, recording
+    saves."""
+    pk = 1
+    saves = []
+
+    def save(self, update_fields=None):
+        if self.language_code == 'error':
+            raise ValueError()
+        self.saves.append((self.pk, self.language_code, update_fields))
+
+
+class LanguageBackendsTestCase(TestCase):
+    """Test backends remembering selected languages."""
+    def setUp(self):
+        super(LanguageBackendsTestCase, self).setUp()
+        self.request = RequestFactory().get('/')
+        self.request.user = LanguageModelUser('fr')
+        self.response = HttpResponse()
+        self.saves = LanguageModelUser.saves = []
+
+    def test_user(self):
+        """The language column of the user is saved if it changed."""
+        backend = UserLanguageBackend(deferred=False)
+        backend.remember(self.request, self.response, 'de')
+        backend.remember(self.request, self.response, 'de')
+        self.assertEqual(self.request.user.language_code, 'de')
+        self.assertEqual(self.saves, [(1, 'de', ['language_code'])])
+
+    def test_user_deferred(self):
+        """Deferred saves run when the request finishes."""
+        backend = UserLanguageBackend(deferred=True)
+        backend.remember(self.request, self.response, 'de')
+        self.assertEqual(self.saves, [])
+        request_finished.send(sender=None)
+        self.assertEqual(self.saves, [(1, 'de', ['language_code'])])
+        request_finished.send(sender=None)
+        self.assertEqual(len(self.saves), 1)
+
+    def test_user_deferred_error(self):
+        """Errors of deferred saves don't break the request."""
+        backend = UserLanguageBackend(deferred=True)
+        backend.remember(self.request, self.response, 'error')
+        request = RequestFactory().get('/')
+        request.user = LanguageModelUser('fr')
+        request.user.pk = 2
+        backend.remember(request, self.response, 'de')
+        logger = logging.getLogger('i18nurl.backends')
+        disabled = logger.disabled
+        logger.disabled = True
+        try:
+            request_finished.send(sender=None)
+        finally:
+            logger.disabled = disabled
+        self.assertEqual(self.saves, [(2, 'de', ['language_code'])])
+
+    def test_session(self):
+        """The session backend falls back to a cookie."""
+        SessionLanguageBackend().remember(self.request, self.response, 'de')
+        self.assertEqual(
+            self.response.cookies[settings.LANGUAGE_COOKIE_NAME].value, 'de')
+        self.request.session = {}
+        SessionLanguageBackend().remember(self.request, self.response, 'en')
+        self.assertEqual(self.request.session['django_language'], 'en')
+
+    def test_get_backends(self):
+        """Backends are instantiated from dotted paths."""
+        backends = get_backends(['i18nurl.backends.CookieLanguageBackend'])
+        self.assertEqual(len(backends), 1)
+        self.assertIsInstance(backends[0], CookieLanguageBackend)
+
+
+class LanguageStoresTestCase(TestCase):
+    """Test bulk lookups of users' languages."""
+    def setUp(self):
+        super(LanguageStoresTestCase, self).setUp()
+        self.user_ids = [
+            User.objects.create(username=str(i), first_name=language).pk
+            for i, language in enumerate(['de', 'it', '', 'en'])]
+        # A stand-in field, auth.User has no language.
+        self.store = ModelLanguageStore(field='first_name')
+
+    def test_model(self):
+        """Languages are read with a single query, and normalized."""
+        with self.assertNumQueries(1):
+            languages = self.store.get_languages(self.user_ids + [0])
+        self.assertEqual([languages[user_id] for user_id in self.user_ids],
+                         ['de', None, None, 'en'])
+        self.assertEqual(languages[0], None)
+
+    def test_cache(self):
+        """Cached languages are read with get_many(), misses from the
+        store."""
+        store = CacheLanguageStore(self.store)
+        store.forget(self.user_ids)
+        with self.assertNumQueries(1):
+            languages = store.get_languages(self.user_ids)
+        with self.assertNumQueries(0):
+            self.assertEqual(store.get_languages(self.user_ids), languages)
+        self.assertEqual(store.get_language(self.user_ids[0]), 'de')
+        store.forget(self.user_ids[:1])
+        with self.assertNumQueries(1):
+            self.assertEqual(store.get_language(self.user_ids[0]), 'de')
+
+    def test_string_ids(self):
+        """Languages are keyed by the ids passed, e.g. strings."""
+        user_ids = [six.text_type(user_id) for user_id in self.user_ids]
+        self.assertEqual(self.store.get_languages(user_ids[:2]),
+                         {user_ids[0]: 'de', user_ids[1]: None})
+        store = CacheLanguageStore(self.store)
+        store.forget(user_ids)
+        self.assertEqual(store.get_language(user_ids[0]), 'de')
+        self.assertEqual(store.get_language(user_ids[0]), 'de')
+
+    def test_forget_on_save(self):
+        """The language store forgets users when they are saved."""
+        store = i18nurl.stores._language_store
+        i18nurl.stores._language_store = CacheLanguageStore(self.store)
+        try:
+            user = User.objects.get(pk=self.user_ids[0])
+            get_language_store().forget([user.pk])
+            self.assertEqual(get_languages([user.pk]), {user.pk: 'de'})
+            user.first_name = 'en'
+            user.save(update_fields=['first_name'])
+            with self.assertNumQueries(0):
+                self.assertEqual(get_languages([user.pk]), {user.pk: 'de'})
+            user.save()
+            with self.assertNumQueries(1):
+                self.assertEqual(get_languages([user.pk]), {user.pk: 'en'})
+        finally:
+            i18nurl.stores._language_store = store
+
+
+class ChainedLanguageMiddlewareTestCase(TestCase):
+    """Test single-pass language detection."""
+    def setUp(self):
+        super(ChainedLanguageMiddlewareTestCase, self).setUp()
+        self.factory = RequestFactory()
+
+    def test_resolvers_order(self):
+        """The first resolver returning a language wins."""
+        middleware = ChainedLanguageMiddleware([
+            'i18nurl.middleware.UrlPrefixLanguageMiddleware',
+            'i18nurl.middleware.HttpAcceptLanguageMiddleware',
+            'i18nurl.middleware.DefaultLanguageMiddleware',
+        ])
+        request = self.factory.get('/de/startseite/',
+                                   HTTP_ACCEPT_LANGUAGE='en')
+        self.assertEqual(middleware.get_language_from_request(request), 'de')
+        request = self.factory.get('/i18n/', HTTP_ACCEPT_LANGUAGE='en')
+        self.assertEqual(middleware.get_language_from_request(request), 'en')
+        request = self.factory.get('/i18n/')
+        self.assertEqual(middleware.get_language_from_request(request),
+                         settings.LANGUAGE_CODE)
+
+    def test_no_resolver(self):
+        """Without resolvers, no language is detected."""
+        middleware = ChainedLanguageMiddleware([])
+        request = self.factory.get('/de/startseite/')
+        self.assertEqual(middleware.get_language_from_request(request), None)
+
+    def test_response(self):
+        """The detected language is activated and sent in the response."""
+        middleware = ChainedLanguageMiddleware()
+        request = self.factory.get('/de/startseite/')
+        middleware.process_request(request)
+        self.assertEqual(request.LANGUAGE_CODE, 'de')
+        self.assertEqual(translation.get_language(), 'de')
+        response = middleware.process_response(request, HttpResponse())
+        self.assertEqual(response['Content-Language'], 'de')
+        self.assertEqual(translation.get_language(), settings.LANGUAGE_CODE)
+
+
+class VaryHeadersTestCase(TestCase):
+    """Test Vary headers depend on the resolvers asked."""
+    def setUp(self):
+        super(VaryHeadersTestCase, self).setUp()
+        self.factory = RequestFactory()
+        self.middleware = ChainedLanguageMiddleware([
+            'i18nurl.middleware.UrlPrefixLanguageMiddleware',
+            'i18nurl.middleware.CookieLanguageMiddleware',
+            'i18nurl.middleware.HttpAcceptLanguageMiddleware',
+            'i18nurl.middleware.DefaultLanguageMiddleware',
+        ])
+
+    def get_response(self, request):
+        self.middleware.process_request(request)
+        return self.middleware.process_response(request, HttpResponse())
+
+    def test_url_prefix(self):
+        """Language from the URL prefix doesn't vary."""
+        request = self.factory.get('/de/startseite/',
+                                   HTTP_ACCEPT_LANGUAGE='en')
+        response = self.get_response(request)
+        self.assertFalse(response.has_header('Vary'))
+        self.assertEqual(request.LANGUAGE_RESOLVER,
+                         'UrlPrefixLanguageMiddleware')
+
+    def test_cookie(self):
+        """Language from a cookie varies on Cookie."""
+        request = self.factory.get('/i18n/')
+        request.COOKIES[settings.LANGUAGE_COOKIE_NAME] = 'de'
+        response = self.get_response(request)
+        self.assertEqual(response['Vary'], 'Cookie')
+        self.assertEqual(request.LANGUAGE_RESOLVER,
+                         'CookieLanguageMiddleware')
+
+    def test_accept_language(self):
+        """Language from Accept-Language varies on the headers of every
+        resolver asked."""
+        request = self.factory.get('/i18n/', HTTP_ACCEPT_LANGUAGE='en')
+        response = self.get_response(request)
+        self.assertEqual(response['Vary'], 'Cookie, Accept-Language')
+        self.assertEqual(request.LANGUAGE_RESOLVER,
+                         'HttpAcceptLanguageMiddleware')
+
+    def test_cache_key(self):
+        """Cache keys depend on the resolved language only."""
+        keys = []
+        for accept in ('en', 'en-us,de;q=0.5', 'de'):
+            request = self.factory.get('/i18n/', HTTP_ACCEPT_LANGUAGE=accept)
+            self.get_response(request)
+            keys.append(get_cache_key(request))
+        self.assertEqual(keys[0], keys[1])
+        self.assertNotEqual(keys[0], keys[2])
+
+
+class HttpAcceptLanguageMiddlewareTestCase(TestCase):
+    """Test language negotiation with Accept-Language header."""
+    def setUp(self):
+        super(HttpAcceptLanguageMiddlewareTestCase, self).setUp()
+        self.middleware = HttpAcceptLanguageMiddleware()
+        self.factory = RequestFactory()
+        self.middleware.cache.clear()
+
+    def get_language(self, accept):
+        request = self.factory.get('/', HTTP_ACCEPT_LANGUAGE=accept)
+        return self.middleware.get_language_from_request(request)
+
+    def test_negotiation(self):
+        """The first supported language of the header is returned."""
+        self.assertEqual(self.get_language('it, de;q=0.8, en;q=0.5'), 'de')
+        self.assertEqual(self.get_language('en-gb'), 'en')
+        self.assertEqual(self.get_language('it'), None)
+
+    def test_cache(self):
+        """Negotiated languages are memoized per header value."""
+        cache = self.middleware.cache
+        self.assertEqual(self.get_language('de'), 'de')
+        self.assertEqual(self.get_language('it'), None)
+        self.assertEqual((cache.hits, cache.misses), (0, 2))
+        self.assertEqual(self.get_language('de'), 'de')
+        self.assertEqual(self.get_language('it'), None)
+        self.assertEqual((cache.hits, cache.misses), (2, 2))
+
+    def test_setting_changed(self):
+        """Memoized languages are dropped when settings.LANGUAGES changes."""
+        self.assertEqual(self.get_language('it'), None)
+        with self.settings(LANGUAGES=(('it', 'Italian'),)):
+            self.assertEqual(self.get_language('it'), 'it')
+        self.assertEqual(self.get_language('it'), None)
+
+    def test_quality(self):
+        """The first entry with the highest q-value wins, unless ``*`` ranks
+        before it, and q=0 is not acceptable."""
+        self.assertEqual(self.get_language('de;q=0.5, en'), 'en')
+        self.assertEqual(self.get_language('de;q=0.5, en;q=0.5'), 'de')
+        self.assertEqual(self.get_language('*;q=0.8, de;q=0.5'), None)
+        self.assertEqual(self.get_language('de;q=0'), None)
+
+    def test_malformed_quality(self):
+        """Parsing stops at an unparseable q-value."""
+        self.assertEqual(self.get_language('en;q=1a'), None)
+        self.assertEqual(self.get_language('de, en;q=1a'), 'de')
+        response = self.client.get('/', HTTP_ACCEPT_LANGUAGE='en;q=1a')
+        self.assertNotEqual(response.status_code, 500)
+
+    def test_hostile_header(self):
+        """Entries beyond the limits are ignored."""
+        accept = ', '.join(['it'] * 10000 + ['de'])
+        self.assertEqual(self.get_language(accept), None)
+        self.assertTrue(len(list(self.middleware.cache._data)[0]) <= 500)
+
+
+class NegotiationTestCase(TestCase):
+    """Test bounded Accept-Language parsing and language negotiation."""
+    def test_truncate(self):
+        """Headers are cut between entries."""
+        self.assertEqual(truncate_accept_language('de, en', 4), 'de')
+        self.assertEqual(truncate_accept_language('de, en', 2), 'de')
+        self.assertEqual(truncate_accept_language('de-de', 2), '')
+        self.assertEqual(truncate_accept_language('de, en', 0), 'de, en')
+
+    def test_iter(self):
+        """Entries are yielded in header order, up to max_entries."""
+        accept = 'de;q=0.5, en, fr;q=0.8'
+        self.assertEqual(list(iter_accept_language(accept)),
+                         [('de', 0.5), ('en', 1.0), ('fr', 0.8)])
+        self.assertEqual(list(iter_accept_language(accept, max_entries=2)),
+                         [('de', 0.5), ('en', 1.0)])
+        self.assertEqual(list(iter_accept_language('de, %%, en')),
+                         [('de', 1.0)])
+        self.assertEqual(list(iter_accept_language('de, en;q=1a, fr')),
+                         [('de', 1.0)])
+
+    def test_lookup(self):
+        """Ranges are looked up subtag by subtag, primary subtags fall back
+        to regional languages."""
+        negotiator = LanguageNegotiator(['en', 'pt-br', 'zh-hant'])
+        self.assertEqual(negotiator.match('EN-gb'), 'en')
+        self.assertEqual(negotiator.match('pt'), 'pt-br')
+        self.assertEqual(negotiator.match('pt-PT'), 'pt-br')
+        self.assertEqual(negotiator.match('zh-hant-tw'), 'zh-hant')
+        self.assertEqual(negotiator.match('de'), None)
+
+    def test_negotiate(self):
+        """The best weighted match wins."""
+        negotiator = LanguageNegotiator(['en', 'pt-br'])
+        self.assertEqual(negotiator.negotiate('de, pt;q=0.8, en;q=0.5'),
+                         'pt-br')
+        self.assertEqual(negotiator.negotiate('de, *;q=0.9, en;q=0.5'), None)
+        self.assertEqual(negotiator.negotiate(''), None)
+
+    def test_setting_changed(self):
+        """The negotiator is rebuilt when settings.LANGUAGES changes."""
+        self.assertEqual(get_negotiator().languages, ('fr', 'en', 'de'))
+        with self.settings(LANGUAGES=(('de', 'German'),)):
+            self.assertEqual(get_negotiator().languages, ('de',))
+
+
+class AvailableLanguagesTestCase(TestCase):
+    """Test the index of languages having a translation catalog."""
+    def test_available(self):
+        """Configured languages with a catalog are available."""
+        self.assertEqual(get_available_languages(),
+                         frozenset(['fr', 'en', 'de']))
+        self.assertTrue(is_language_available('de'))
+        self.assertFalse(is_language_available('it'))
+
+    def test_setting_changed(self):
+        """The index is rebuilt when settings.LANGUAGES changes."""
+        with self.settings(LANGUAGES=(('it', 'Italian'),
+                                      ('xx', 'Unknown'))):
+            self.assertEqual(get_available_languages(), frozenset(['it']))
+        self.assertFalse(is_language_available('it'))
+
+    def test_template_filter(self):
+        """language_available filter tells if a language is available."""
+        template = Template('{% load i18nurl %}'
+                            '{{ "de"|language_available }} '
+                            '{{ "it"|language_available }}')
+        self.assertEqual(template.render(Context()), 'True False')
+
+
+class ReverseCacheTestCase(TestCase):
+    """Test memoization of reverse_i18n."""
+    def setUp(self):
+        super(ReverseCacheTestCase, self).setUp()
+        self.maxsize = reverse_cache.maxsize
+        reverse_cache.maxsize = 10
+        reverse_cache.clear()
+
+    def tearDown(self):
+        reverse_cache.maxsize = self.maxsize
+        reverse_cache.clear()
+        super(ReverseCacheTestCase, self).tearDown()
+
+    def test_cache(self):
+        """URLs are memoized per view name and language."""
+        self.assertEqual(reverse_i18n('home', 'de'), '/de/startseite/')
+        self.assertEqual(reverse_i18n('home', 'fr'), '/fr/accueil/')
+        self.assertEqual(reverse_i18n('home', 'de'), '/de/startseite/')
+        self.assertEqual((reverse_cache.hits, reverse_cache.misses), (1, 2))
+
+    def test_clear_url_caches(self):
+        """Memoized URLs are dropped when URLconf caches are cleared."""
+        reverse_i18n('home', 'de')
+        clear_url_caches()
+        reverse_i18n('home', 'de')
+        self.assertEqual((reverse_cache.hits, reverse_cache.misses), (0, 1))
+        self.assertEqual(len(reverse_cache), 1)
+
+    def test_unhashable_arguments(self):
+        """Calls with unhashable arguments are not memoized."""
+        reverse_i18n('home', 'de', kwargs={'unused': []})
+        self.assertEqual(len(reverse_cache), 0)
+
+
+class ReverseAllTestCase(TestCase):
+    """Test reversing URLs in several languages at once."""
+    def test_all_languages(self):
+        """URLs are returned for settings.I18N_LANGUAGES, in order."""
+        urls = reverse_i18n_all('home')
+        self.assertEqual(list(urls.items()), [('fr', '/fr/accueil/'),
+                                              ('en', '/en/home/'),
+                                              ('de', '/de/startseite/')])
+        self.assertEqual(translation.get_language(), settings.LANGUAGE_CODE)
+
+    def test_languages(self):
+        """Languages can be given explicitly."""
+        self.assertEqual(dict(reverse_i18n_all('home', ['de'])),
+                         {'de': '/de/startseite/'})
+
+    def test_template_tag(self):
+        """i18nurl_all tag assigns the mapping to a variable."""
+        template = Template('{% load i18nurl %}'
+                            '{% i18nurl_all "home" as urls %}'
+                            '{% for language, url in urls.items %}'
+                            '{{ language }}={{ url }} {% endfor %}'
+                            '{% i18nurl_all "missing" as urls %}{{ urls }}')
+        self.assertEqual(template.render(Context()),
+                         'fr=/fr/accueil/ en=/en/home/ de=/de/startseite/ {}')
+
+
+class ReverseIsolatedTestCase(TestCase):
+    """Test reversing URLs without activating the language."""
+    def test_reverse(self):
+        """URLs are reversed in language, the active one is left alone."""
+        with override_language('fr'):
+            translation_object = translation.trans_real._active.value
+            self.assertEqual(reverse_i18n_isolated('home', 'de'),
+                             '/de/startseite/')
+            self.assertEqual(reverse_i18n_isolated('home', 'en'),
+                             '/en/home/')
+            self.assertIs(translation.trans_real._active.value,
+                          translation_object)
+            self.assertEqual(reverse('home'), '/fr/accueil/')
+
+    def test_fallbacks(self):
+        """Fallbacks of settings.I18N_REVERSE_FALLBACK are tried."""
+        self.assertEqual(reverse_i18n_isolated('home', 'de',
+                                               kwargs={'page': 1}),
+                         '/de/startseite/')
+
+    def test_unknown_namespace(self):
+        """NoReverseMatch is raised for unknown namespaces."""
+        self.assertRaises(NoReverseMatch, reverse_i18n_isolated,
+                          'missing:home', 'de')
+
+    def get_namespaced_urlconf(self):
+        """Return a URLconf with two instances of the "site" application."""
+        urlconf = types.ModuleType(str('namespaced_urls'))
+        urlconf.urlpatterns = patterns(
+            '',
+            url(r'^main/', include(ihm_patterns, 'site', 'site')),
+            url(r'^other/', include(ihm_patterns, 'other', 'site')),
+        )
+        return urlconf
+
+    def test_namespace(self):
+        """Namespaced URLs are reversed in language."""
+        urlconf = self.get_namespaced_urlconf()
+        with override_language('fr'):
+            translation_object = translation.trans_real._active.value
+            for name, language, expected in (
+                    ('site:home', 'de', '/main/startseite/'),
+                    ('site:home', 'en', '/main/home/'),
+                    ('other:home', 'de', '/other/startseite/')):
+                self.assertEqual(i18nurl.resolvers.reverse(
+                    name, language, urlconf), expected)
+            self.assertIs(translation.trans_real._active.value,
+                          translation_object)
+
+    def test_current_app(self):
+        """Instance namespaces are picked by current_app."""
+        urlconf = self.get_namespaced_urlconf()
+        self.assertEqual(i18nurl.resolvers.reverse(
+            'site:home', 'de', urlconf, current_app='other'),
+            '/other/startseite/')
+        self.assertEqual(i18nurl.resolvers.reverse(
+            'site:home', 'de', urlconf, current_app='missing'),
+            '/main/startseite/')
+        self.assertRaises(NoReverseMatch, i18nurl.resolvers.reverse,
+                          'site:missing:home', 'de', urlconf)
+
+
+class ResolverRegistryTestCase(TestCase):
+    """Test the registry of per-language resolvers."""
+    def test_warm(self):
+        """Resolvers of settings.I18N_LANGUAGES are populated."""
+        warm_resolvers()
+        for language in ['fr', 'en', 'de']:
+            resolver = get_language_resolver(language)
+            self.assertIs(get_language_resolver(language), resolver)
+            self.assertIn(language, resolver._reverse_dict)
+
+    def test_clear_url_caches(self):
+        """Resolvers are built again when URLconf caches are cleared."""
+        resolver = get_language_resolver('de')
+        clear_url_caches()
+        self.assertIsNot(get_language_resolver('de'), resolver)
+
+    def test_resolve(self):
+        """Resolvers resolve translated paths of their language."""
+        match = get_language_resolver('de').resolve('/de/startseite/')
+        self.assertEqual(match.url_name, 'home')
+
+
+class WarmupTestCase(TestCase):
+    """Test warming up of i18n caches."""
+    def setUp(self):
+        super(WarmupTestCase, self).setUp()
+        self.maxsize = reverse_cache.maxsize
+        reverse_cache.maxsize = 100
+        reverse_cache.clear()
+        clear_url_caches()
+
+    def tearDown(self):
+        reverse_cache.maxsize = self.maxsize
+        reverse_cache.clear()
+        super(WarmupTestCase, self).tearDown()
+
+    def test_phases(self):
+        """Each phase is timed, named URLs are reversed in each language."""
+        timings = warmup()
+        self.assertEqual([phase for phase, count, duration in timings],
+                         ['languages', 'catalogs', 'patterns', 'urls'])
+        self.assertEqual(timings[-1][1], 9)
+        self.assertEqual(len(reverse_cache), 9)
+        for language in ['fr', 'en', 'de']:
+            self.assertIn(language,
+                          get_language_resolver(language)._reverse_dict)
+            self.assertIn(language, get_resolver(None)._reverse_dict)
+        misses = reverse_cache.misses
+        self.assertEqual(reverse_i18n_isolated('home', 'de'),
+                         '/de/startseite/')
+        self.assertEqual(reverse_cache.misses, misses)
+
+    def test_no_reverse_cache(self):
+        """URLs are not reversed if they would not be cached."""
+        reverse_cache.maxsize = 0
+        timings = warmup()
+        self.assertEqual([phase for phase, count, duration in timings],
+                         ['languages', 'catalogs', 'patterns'])
+        self.assertEqual(len(reverse_cache), 0)
+
+    def test_url_names(self):
+        """Names of URLs without arguments are found."""
+        self.assertEqual(
+            sorted(get_url_names(get_language_resolver('de'), 'de')),
+            ['guess_language', 'home', 'set_language'])
+
+    def test_command(self):
+        """i18nurl_warmup command prints the duration of each phase."""
+        stdout = six.StringIO()
+        call_command('i18nurl_warmup', languages=['de'], stdout=stdout)
+        self.assertIn('urls: 3 in ', stdout.getvalue())
+
+    def test_startup(self):
+        """Caches are warmed up at startup only if settings.I18N_WARMUP."""
+        self.assertFalse(i18nurl.warmup.I18N_WARMUP)
+        try:
+            for enabled in (False, True):
+                clear_url_caches()
+                i18nurl.resolvers._language_resolvers.clear()
+                i18nurl.warmup.I18N_WARMUP = enabled
+                startup()
+                self.assertEqual(
+                    bool(i18nurl.resolvers._language_resolvers), enabled)
+        finally:
+            i18nurl.warmup.I18N_WARMUP = False
+
+
+class ReverseFallbackTestCase(TestCase):
+    """Test reverse_i18n fallbacks and memoization of failed lookups."""
+    def setUp(self):
+        super(ReverseFallbackTestCase, self).setUp()
+        self.fallback = i18nurl.I18N_REVERSE_FALLBACK
+        no_reverse_cache.clear()
+
+    def tearDown(self):
+        i18nurl.I18N_REVERSE_FALLBACK = self.fallback
+        no_reverse_cache.clear()
+        super(ReverseFallbackTestCase, self).tearDown()
+
+    def test_no_args_fallback(self):
+        """By default, URLs are reversed without arguments if needed."""
+        self.assertEqual(reverse_i18n('home', 'de', kwargs={'page': 1}),
+                         '/de/startseite/')
+
+    def test_project_fallback(self):
+        """By default, URLs are reversed relative to the project package."""
+        urlconf = types.ModuleType(str('project_urls'))
+        urlconf.urlpatterns = patterns(
+            '', url(r'^reroute/$', 'demoproject.views.reroute'))
+        self.assertEqual(reverse_i18n('views.reroute', 'de', urlconf),
+                         '/reroute/')
+        self.assertEqual(reverse_i18n('views.reroute', 'de', urlconf,
+                                      args=[1]),
+                         '/reroute/')
+        i18nurl.I18N_REVERSE_FALLBACK = 'no_args'
+        self.assertRaises(NoReverseMatch, reverse_i18n, 'views.reroute', 'de',
+                          urlconf)
+
+    def test_dropped_arguments_warning(self):
+        """A warning is logged when arguments are dropped."""
+        records = []
+        handler = logging.Handler()
+        handler.emit = records.append
+        logger = logging.getLogger('i18nurl')
+        logger.addHandler(handler)
+        try:
+            reverse_i18n('home', 'de')
+            self.assertEqual(records, [])
+            reverse_i18n('home', 'de', kwargs={'page': 1})
+        finally:
+            logger.removeHandler(handler)
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0].levelno, logging.WARNING)
+        self.assertIn("'home'", records[0].getMessage())
+
+    def test_strict(self):
+        """Strict policy doesn't fall back."""
+        i18nurl.I18N_REVERSE_FALLBACK = 'strict'
+        self.assertRaises(NoReverseMatch, reverse_i18n, 'home', 'de',
+                          kwargs={'page': 1})
+
+    def test_no_reverse_cache(self):
+        """Failed lookups are looked up once."""
+        self.assertRaises(NoReverseMatch, reverse_i18n, 'missing', 'de')
+        misses = no_reverse_cache.misses
+        self.assertRaises(NoReverseMatch, reverse_i18n, 'missing', 'de')
+        self.assertEqual(no_reverse_cache.misses, misses)
+        self.assertEqual(no_reverse_cache.hits, len(no_reverse_cache))
+
+    def test_no_reverse_cache_unused(self):
+        """Until a lookup fails, the cache of failed lookups is not read."""
+        self.assertEqual(reverse_i18n('home', 'de'), '/de/startseite/')
+        self.assertEqual((no_reverse_cache.hits, no_reverse_cache.misses),
+                         (0, 0))
+
+    def test_template_tag(self):
+        """Missing URLs raise NoReverseMatch, unless assigned."""
+        template = Template('{% load i18nurl %}{% i18nurl "missing" "de" %}')
+        self.assertRaises(NoReverseMatch, template.render, Context())
+        template = Template('{% load i18nurl %}'
+                            '{% i18nurl "missing" "de" as url %}[{{ url }}]')
+        self.assertEqual(template.render(Context()), '[]')
+
+
+class ConstantURLNodeTestCase(TestCase):
+    """Test URLs of i18nurl tags with constant arguments are cached."""
+    def get_node(self, template):
+        return Template('{% load i18nurl %}' + template).nodelist[-1]
+
+    def test_constant(self):
+        """Literal arguments without filters are constant."""
+        self.assertTrue(self.get_node('{% i18nurl "home" "de" %}').constant)
+        self.assertTrue(self.get_node('{% i18nurl "home" "de" 1 %}').constant)
+        self.assertFalse(self.get_node('{% i18nurl "home" lang %}').constant)
+        self.assertFalse(
+            self.get_node('{% i18nurl "home" "de"|lower %}').constant)
+
+    def test_cached_url(self):
+        """URL is reversed on first render, until URLconf caches are
+        cleared."""
+        node = self.get_node('{% i18nurl "home" "de" %}')
+        self.assertEqual(node.cached_url, None)
+        self.assertEqual(node.render(Context()), '/de/startseite/')
+        state, url = node.cached_url
+        self.assertEqual(url, '/de/startseite/')
+        self.assertEqual(node.render(Context()), '/de/startseite/')
+        self.assertTrue(node.cached_url[0] is state)
+        clear_url_caches()
+        self.assertEqual(node.render(Context()), '/de/startseite/')
+        self.assertFalse(node.cached_url[0] is state)
+
+    def test_asvar(self):
+        """Cached URL is assigned to the variable on each render."""
+        template = Template('{% load i18nurl %}'
+                            '{% i18nurl "home" "de" as url %}{{ url }}')
+        self.assertEqual(template.render(Context()), '/de/startseite/')
+        self.assertEqual(template.render(Context()), '/de/startseite/')
+
+
+class RenderByLanguageTestCase(TestCase):
+    """Test rendering of a template for many languages."""
+    def test_render(self):
+        """Renderings are in order, URLs are shared within the batch."""
+        template = Template('{% load i18n i18nurl %}'
+                            '{% get_current_language as language %}'
+                            '{{ name }} {% i18nurl "home" language %}')
+        with url_cache() as urls:
+            renderings = render_by_language(template, [
+                ({'name': 'a'}, 'de'),
+                (Context({'name': 'b'}), 'en'),
+                ({'name': 'c'}, 'de'),
+                ({'name': 'd'}, None),
+            ])
+            self.assertEqual(len(urls), 3)
+        self.assertEqual(renderings, ['a /de/startseite/', 'b /en/home/',
+                                      'c /de/startseite/', 'd /fr/accueil/'])
+        self.assertEqual(translation.get_language(), settings.LANGUAGE_CODE)
+
+    def test_active_language(self):
+        """None and empty languages are rendered as a single group."""
+        activations = []
+        override = i18nurl.rendering.override_language
+
+        def override_language(language):
+            activations.append(language)
+            return override(language)
+
+        i18nurl.rendering.override_language = override_language
+        try:
+            renderings = render_by_language(
+                Template('{{ name }}'),
+                [({'name': 'a'}, None), ({'name': 'b'}, ''),
+                 ({'name': 'c'}, None)])
+        finally:
+            i18nurl.rendering.override_language = override
+        self.assertEqual(renderings, ['a', 'b', 'c'])
+        self.assertEqual(activations, [settings.LANGUAGE_CODE])
+
+    def test_url_cache(self):
+        """URLs are memoized within url_cache blocks only."""
+        with url_cache() as urls:
+            self.assertEqual(reverse_i18n('home', 'de'), '/de/startseite/')
+            self.assertEqual(list(urls.values()), ['/de/startseite/'])
+            with url_cache() as nested_urls:
+                self.assertIs(nested_urls, urls)
+            clear_url_caches()
+            reverse_i18n('home', 'en')
+            self.assertEqual(list(urls.values()), ['/en/home/'])
+        self.assertEqual(i18nurl._local.urls, None)
+
+
+class SitemapsTestCase(TestCase):
+    """Test multilingual sitemaps."""
+    def setUp(self):
+        super(SitemapsTestCase, self).setUp()
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        super(SitemapsTestCase, self).tearDown()
+
+    def read(self, file_name):
+        with open(os.path.join(self.directory, file_name)) as sitemap:
+            return sitemap.read()
+
+    def test_iter(self):
+        """Each language has a URL, with alternate links."""
+        sitemap = ''.join(iter_sitemap([('home', None, None)],
+                                       'http://example.com', ['de', 'en']))
+        self.assertEqual(sitemap.count('<url>'), 2)
+        self.assertIn('<loc>http://example.com/de/startseite/</loc>', sitemap)
+        self.assertEqual(sitemap.count(
+            '<xhtml:link rel="alternate" hreflang="en"'
+            ' href="http://example.com/en/home/"/>'), 2)
+
+    def test_write(self):
+        """Sitemaps are sharded and indexed."""
+        for processes in (1, 2):
+            file_names = write_sitemaps(
+                [('home', None, None)] * 5, self.directory,
+                'http://example.com', processes=processes, shard_size=6)
+            self.assertEqual(file_names, ['sitemap-1.xml', 'sitemap-2.xml',
+                                          'sitemap-3.xml'])
+            self.assertEqual(self.read('sitemap-1.xml').count('<url>'), 6)
+            self.assertEqual(self.read('sitemap-3.xml').count('<url>'), 3)
+            self.assertIn('<loc>http://example.com/sitemap-3.xml</loc>',
+                          self.read('sitemap.xml'))
+
+    def test_no_languages(self):
+        """Writing sitemaps without languages is an error."""
+        self.assertRaises(ValueError, write_sitemaps, [('home', None, None)],
+                          self.directory, languages=[])
+        languages = i18nurl.sitemaps.I18N_LANGUAGES
+        i18nurl.sitemaps.I18N_LANGUAGES = ()
+        try:
+            self.assertRaises(ValueError, write_sitemaps, [], self.directory)
+        finally:
+            i18nurl.sitemaps.I18N_LANGUAGES = languages
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_max_bytes(self):
+        """Sitemaps exceeding max_bytes are split."""
+        url_size = len(''.join(iter_sitemap([('home', None, None)],
+                                            languages=['de']))
+                       .encode('utf-8'))
+        file_names = write_sitemaps(
+            [('home', None, None)] * 5, self.directory, processes=1,
+            languages=['de'], shard_size=3, max_bytes=url_size + 1)
+        self.assertEqual(file_names, ['sitemap-1.xml', 'sitemap-1-2.xml',
+                                      'sitemap-1-3.xml', 'sitemap-2.xml',
+                                      'sitemap-2-2.xml'])
+        for file_name in file_names:
+            sitemap = self.read(file_name)
+            self.assertEqual(sitemap.count('<url>'), 1)
+            self.assertTrue(sitemap.endswith('</urlset>\n'))
+            self.assertTrue(len(sitemap.encode('utf-8')) <= url_size + 1)
+
+    def test_bounded_submission(self):
+        """Entries are read as shards are written, not all at once."""
+        consumed = []
+
+        def iter_numbers():
+            for number in range(20):
+                consumed.append(number)
+                yield number
+
+        pool = Pool(2)
+        try:
+            for index, result in enumerate(
+                    _imap_bounded(pool, abs, iter_numbers(), 3)):
+                self.assertEqual(result, index)
+                self.assertTrue(len(consumed) <= index + 4)
+        finally:
+            pool.close()
+            pool.join()
+
+
+class AlternatesTestCase(TestCase):
+    """Test i18n_alternates template tag."""
+    def test_page(self):
+        """Demo home page links to its alternates in all languages."""
+        response = self.client.get('/de/startseite/')
+        self.assertContains(
+            response, '<link rel="alternate" hreflang="fr" '
+                      'href="http://testserver/fr/accueil/" />')
+        self.assertContains(
+            response, '<link rel="alternate" hreflang="de" '
+                      'href="http://testserver/de/startseite/" />')
+
+    def test_request_memoization(self):
+        """Alternates are computed once per request."""
+        with translation.override('de'):
+            request = RequestFactory().get('/de/startseite/')
+            request.resolver_match = resolve('/de/startseite/')
+        template = Template('{% load i18nurl %}'
+                            '{% i18n_alternates as urls %}{{ urls.en }}')
+        context = Context({'request': request})
+        self.assertEqual(template.render(context),
+                         'http://testserver/en/home/')
+        alternates = request._i18n_alternates
+        template.render(context)
+        self.assertTrue(request._i18n_alternates is alternates)
+
+    def test_no_request(self):
+        """Without request in context, there are no alternates."""
+        template = Template('{% load i18nurl %}[{% i18n_alternates %}]')
+        self.assertEqual(template.render(Context()), '[]')
+
+
+class InstrumentationTestCase(TestCase):
+    """Test language_resolved signal and its aggregator."""
+    def setUp(self):
+        super(InstrumentationTestCase, self).setUp()
+        self.stats = LanguageStats()
+        self.stats.connect()
+        self.middleware = ChainedLanguageMiddleware([
+            'i18nurl.middleware.UrlPrefixLanguageMiddleware',
+            'i18nurl.middleware.HttpAcceptLanguageMiddleware',
+        ])
+        HttpAcceptLanguageMiddleware.cache.clear()
+
+    def tearDown(self):
+        self.stats.disconnect()
+        super(InstrumentationTestCase, self).tearDown()
+
+    def resolve(self, path, accept):
+        request = RequestFactory().get(path, HTTP_ACCEPT_LANGUAGE=accept)
+        self.middleware.process_request(request)
+        self.middleware.process_response(request, HttpResponse())
+
+    def test_signal(self):
+        """Signal is sent once per request with the details of stages."""
+        calls = []
+
+        def receiver(sender, **kwargs):
+            calls.append(kwargs)
+
+        language_resolved.connect(receiver)
+        try:
+            self.resolve('/i18n/', 'de')
+            self.resolve('/i18n/', 'de')
+        finally:
+            language_resolved.disconnect(receiver)
+        self.assertEqual(len(calls), 2)
+        for call, cache_hit in zip(calls, (False, True)):
+            self.assertEqual(call['resolver'], 'HttpAcceptLanguageMiddleware')
+            self.assertEqual(call['language'], 'de')
+            self.assertEqual(call['cache_hit'], cache_hit)
+            self.assertEqual(
+                [stage[:3] for stage in call['stages']],
+                [('UrlPrefixLanguageMiddleware', None, False),
+                 ('HttpAcceptLanguageMiddleware', 'de', cache_hit)])
+            self.assertEqual(sorted(call['timings']),
+                             ['process_request', 'process_response'])
+            self.assertEqual(call['duration'], sum(call['timings'].values()))
+            self.assertTrue(all(stage[3] >= 0 for stage in call['stages']))
+
+    def test_signal_once(self):
+        """Signal is sent once by stacked language middlewares."""
+        calls = []
+
+        def receiver(sender, **kwargs):
+            calls.append(sender)
+
+        middlewares = [UrlPrefixLanguageMiddleware(),
+                       HttpAcceptLanguageMiddleware()]
+        request = RequestFactory().get('/i18n/', HTTP_ACCEPT_LANGUAGE='de')
+        language_resolved.connect(receiver)
+        try:
+            for middleware in middlewares:
+                middleware.process_request(request)
+            response = HttpResponse()
+            for middleware in reversed(middlewares):
+                response = middleware.process_response(request, response)
+        finally:
+            language_resolved.disconnect(receiver)
+        self.assertEqual(calls, [HttpAcceptLanguageMiddleware])
+
+    def test_stats(self):
+        """Aggregator counts resolutions per resolver."""
+        self.resolve('/en/', 'de')
+        self.resolve('/i18n/', 'de')
+        self.resolve('/i18n/', 'de')
+        snapshot = self.stats.snapshot()
+        prefix = snapshot['UrlPrefixLanguageMiddleware']
+        self.assertEqual(prefix['count'], 3)
+        self.assertEqual(prefix['languages'], {'en': 1, None: 2})
+        accept = snapshot['HttpAcceptLanguageMiddleware']
+        self.assertEqual((accept['count'], accept['cache_hits']), (2, 1))
+        self.assertEqual(sum(count for bound, count in accept['histogram']),
+                         2)
+        self.stats.reset()
+        self.assertEqual(self.stats.snapshot(), {})
+
+
+class ActivationTestCase(TestCase):
+    """Test activation of languages which may already be active."""
+    def tearDown(self):
+        translation.deactivate()
+        super(ActivationTestCase, self).tearDown()
+
+    def test_activate_language(self):
+        """Languages are activated only if they are not active yet."""
+        self.assertTrue(activate_language('de'))
+        self.assertEqual(translation.get_language(), 'de')
+        self.assertFalse(activate_language('de'))
+        self.assertEqual(translation.get_language(), 'de')
+
+    def test_override_language(self):
+        """Previous language is restored, if another one was activated."""
+        translation.activate('de')
+        with override_language('en'):
+            self.assertEqual(translation.get_language(), 'en')
+        self.assertEqual(translation.get_language(), 'de')
+        active = translation.trans_real._active.value
+        with override_language('de'):
+            self.assertTrue(translation.trans_real._active.value is active)
+        self.assertTrue(translation.trans_real._active.value is active)
+
+    def test_deactivated(self):
+        """Languages are activated if no real translation is active."""
+        with translation.override(None):
+            self.assertEqual(translation.ugettext('Yes'), 'Yes')
+            self.assertEqual(translation.get_language(),
+                             settings.LANGUAGE_CODE)
+            with override_language(settings.LANGUAGE_CODE):
+                self.assertEqual(translation.ugettext('Yes'), 'Oui')
+            self.assertEqual(translation.ugettext('Yes'), 'Yes')
+            self.assertTrue(activate_language(settings.LANGUAGE_CODE))
+            self.assertEqual(translation.ugettext('Yes'), 'Oui')
+
+    def test_reverse_all_deactivated(self):
+        """reverse_i18n_all leaves translations deactivated."""
+        with translation.override(None):
+            reverse_i18n_all('home', ['fr', 'de'])
+            self.assertEqual(translation.ugettext('Yes'), 'Yes')
+        translation.deactivate()
+        reverse_i18n_all('home', ['fr', 'de'])
+        self.assertFalse(hasattr(translation.trans_real._active, 'value'))
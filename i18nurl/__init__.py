@@ -1,17 +1,286 @@
 # -*- coding: utf-8 -*-
-from django.core.urlresolvers import reverse
-from django.utils import translation
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
 
+from django.core.urlresolvers import (NoReverseMatch, get_resolver,
+                                      get_script_prefix, get_urlconf)
+from django.utils import six
+from django.utils.translation import trans_real
 
-def reverse_i18n(url, language, *args, **kwargs):
-    """Return the i18n url in a specific language."""
-    cur_language = translation.get_language()
+from . import resolvers
+from .cache import LRUCache
+from .settings import (I18N_LANGUAGES, I18N_NO_REVERSE_CACHE_SIZE,
+                       I18N_REVERSE_CACHE_SIZE, I18N_REVERSE_FALLBACK)
+from .utils import (activate_language, override_language,
+                    restore_translation)
+
+
+default_app_config = 'i18nurl.apps.I18nURLConfig'
+
+logger = logging.getLogger(__name__)
+
+#: Memo of :func:`reverse_i18n` results, disabled unless
+#: settings.I18N_REVERSE_CACHE_SIZE is set.
+reverse_cache = LRUCache(I18N_REVERSE_CACHE_SIZE)
+
+#: Memo of lookups which raised NoReverseMatch, so that a missing URL is
+#: looked up once.
+no_reverse_cache = LRUCache(I18N_NO_REVERSE_CACHE_SIZE)
+
+#: Resolvers the caches were filled with, per URLconf.
+_cached_resolvers = {}
+
+#: Thread-local state: ``urls`` is the cache of :func:`url_cache` blocks.
+_local = threading.local()
+
+
+def _get_reverse_cache_key(url, language, urlconf=None, args=None,
+                           kwargs=None, prefix=None, current_app=None):
+    """Return the key of a reverse call in ``reverse_cache`` and
+    ``no_reverse_cache``, or None if the arguments cannot be hashed.
+
+    Both caches, and the one of :func:`url_cache`, are cleared if URLconf
+    caches were cleared since they were filled.
+
+    """
+    if urlconf is None:
+        urlconf = get_urlconf()
+    resolver = get_resolver(urlconf)
+    cached_resolver = _cached_resolvers.get(urlconf)
+    if cached_resolver is not resolver:
+        if cached_resolver is not None:
+            reverse_cache.clear()
+            no_reverse_cache.clear()
+            _cached_resolvers.clear()
+            if getattr(_local, 'urls', None):
+                _local.urls.clear()
+        _cached_resolvers[urlconf] = resolver
+    if prefix is None:
+        prefix = get_script_prefix()
+    key = (url, language, urlconf, tuple(args or ()),
+           tuple(sorted((kwargs or {}).items())), prefix, current_app)
     try:
-        translation.activate(language)
-        try:
-            url = reverse(url, *args, **kwargs)
-        except:
-            url = reverse(url)
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+@contextmanager
+def url_cache():
+    """Memoize URLs reversed by :func:`reverse_i18n` and its variants within
+    the block, in the current thread, even if settings.I18N_REVERSE_CACHE_SIZE
+    is 0.
+
+    Nested blocks share the cache of the outermost one. Yield the cache, a
+    dict.
+
+    """
+    urls = getattr(_local, 'urls', None)
+    if urls is not None:
+        yield urls
+        return
+    _local.urls = urls = {}
+    try:
+        yield urls
     finally:
-        translation.activate(cur_language)
+        _local.urls = None
+
+
+def _get_cache_key(url, language, *args, **kwargs):
+    """Return the key of a reverse call if a cache may hold it, else None.
+
+    The key is computed, and URLconf changes are checked, only when a cache
+    is enabled or, for ``no_reverse_cache``, holds failed lookups, so that
+    uncached reverse calls don't pay for it.
+
+    """
+    if getattr(_local, 'urls', None) is None and not reverse_cache.maxsize \
+            and not no_reverse_cache:
+        return None
+    return _get_reverse_cache_key(url, language, *args, **kwargs)
+
+
+def _get_cached_url(key):
+    """Return the URL memoized for key, or None."""
+    if key is None:
+        return None
+    urls = getattr(_local, 'urls', None)
+    if urls is not None and key in urls:
+        return urls[key]
+    if not reverse_cache.maxsize:
+        return None
+    return reverse_cache.get(key)
+
+
+def _set_cached_url(key, url):
+    """Memoize url, the result of the reverse call of key."""
+    if key is None:
+        return
+    reverse_cache.set(key, url)
+    urls = getattr(_local, 'urls', None)
+    if urls is not None:
+        urls[key] = url
+
+
+def reverse_i18n(url, language, *args, **kwargs):
+    """Return the i18n url in a specific language.
+
+    The language is active while reversing, so that lazy arguments are
+    translated in it. If the url cannot be reversed, fallbacks are tried as
+    configured by settings.I18N_REVERSE_FALLBACK.
+
+    """
+    key = _get_cache_key(url, language, *args, **kwargs)
+    cached_url = _get_cached_url(key)
+    if cached_url is not None:
+        return cached_url
+    with override_language(language):
+        url = _reverse(url, language, *args, key=key, **kwargs)
+    _set_cached_url(key, url)
+    return url
+
+
+def reverse_i18n_isolated(url, language, *args, **kwargs):
+    """Return the i18n url in a specific language, like :func:`reverse_i18n`,
+    without activating the language.
+
+    Patterns are resolved by a resolver bound to ``language``, so that the
+    active translation is left alone once the resolver is populated. Lazy
+    patterns are translated in the active language, so populating a resolver,
+    on its first use or by :func:`i18nurl.resolvers.warm_resolvers`,
+    activates ``language`` and restores the previous translation before
+    returning, without yielding to other code meanwhile.
+
+    """
+    key = _get_cache_key(url, language, *args, **kwargs)
+    cached_url = _get_cached_url(key)
+    if cached_url is not None:
+        return cached_url
+    url = _reverse(url, language, *args, key=key, **kwargs)
+    _set_cached_url(key, url)
     return url
+
+
+def reverse_i18n_all(url, languages=None, *args, **kwargs):
+    """Return an ordered mapping of the i18n url in several languages.
+
+    ``languages`` defaults to codes of settings.I18N_LANGUAGES. Each language
+    is activated at most once, and the previous translation is restored at
+    the end, as by :func:`i18nurl.utils.override_language`.
+
+    """
+    if languages is None:
+        languages = [code for code, name in I18N_LANGUAGES]
+    urls = OrderedDict()
+    previous = getattr(trans_real._active, 'value', None)
+    changed = False
+    try:
+        for language in languages:
+            key = _get_cache_key(url, language, *args, **kwargs)
+            cached_url = _get_cached_url(key)
+            if cached_url is not None:
+                urls[language] = cached_url
+                continue
+            changed = activate_language(language) or changed
+            urls[language] = _reverse(url, language, *args, key=key,
+                                      **kwargs)
+            _set_cached_url(key, urls[language])
+    finally:
+        if changed:
+            restore_translation(previous)
+    return urls
+
+
+def _reverse(url, language, urlconf=None, args=None, kwargs=None,
+             prefix=None, current_app=None, key=None):
+    """Reverse url in ``language``, with the resolver of the registry bound
+    to it.
+
+    Fallbacks of settings.I18N_REVERSE_FALLBACK are tried in order until one
+    succeeds, skipping those remembered as failed in ``no_reverse_cache``.
+    If they all fail, the error of the first one is raised. A warning is
+    logged when arguments are dropped.
+
+    ``key`` is the cache key of the call, if already computed. Keys of
+    fallbacks are derived from it. Until a lookup fails, url is reversed
+    directly, without computing keys nor fallbacks.
+
+    """
+    error = None
+    if not no_reverse_cache:
+        try:
+            return resolvers.reverse(url, language, urlconf, args, kwargs,
+                                     prefix, current_app)
+        except NoReverseMatch as e:
+            error = e
+            if no_reverse_cache.maxsize:
+                key = key or _get_reverse_cache_key(
+                    url, language, urlconf, args, kwargs, prefix,
+                    current_app)
+                if key is not None:
+                    no_reverse_cache.set(key, e.args)
+    fallbacks = _get_fallbacks(url, args, kwargs)
+    if error is not None:
+        next(fallbacks)  # Already tried.
+    for view_name, view_args, view_kwargs in fallbacks:
+        fallback_key = None
+        if no_reverse_cache:
+            key = key or _get_reverse_cache_key(url, language, urlconf, args,
+                                                kwargs, prefix, current_app)
+            fallback_key = _get_fallback_key(key, view_name, view_args,
+                                             view_kwargs)
+            if fallback_key is not None:
+                cached_error = no_reverse_cache.get(fallback_key)
+                if cached_error is not None:
+                    error = error or NoReverseMatch(*cached_error)
+                    continue
+        try:
+            reversed_url = resolvers.reverse(view_name, language, urlconf,
+                                             view_args, view_kwargs, prefix,
+                                             current_app)
+        except NoReverseMatch as e:
+            if fallback_key is not None:
+                no_reverse_cache.set(fallback_key, e.args)
+            error = error or e
+            continue
+        if (args or kwargs) and not (view_args or view_kwargs):
+            logger.warning('Reversed %r in %s without arguments %r %r: %s',
+                           url, language, args, kwargs, error)
+        return reversed_url
+    raise error
+
+
+def _get_fallback_key(key, url, args, kwargs):
+    """Return the cache key of a fallback lookup, derived from key, the one
+    of the reverse call, or None if key is None."""
+    if key is None:
+        return None
+    return (url, key[1], key[2], tuple(args or ()),
+            tuple(sorted((kwargs or {}).items()))) + key[5:]
+
+
+def _get_fallbacks(url, args, kwargs):
+    """Yield (url, args, kwargs) lookups to try, as configured by
+    settings.I18N_REVERSE_FALLBACK:
+
+    * ``'strict'``: the url with its arguments only,
+    * ``'no_args'``: then the url without arguments,
+    * ``'project'``: then both relative to the project package.
+
+    """
+    from django.conf import settings
+    yield url, args, kwargs
+    if I18N_REVERSE_FALLBACK == 'strict':
+        return
+    if args or kwargs:
+        yield url, None, None
+    if I18N_REVERSE_FALLBACK == 'project' and settings.SETTINGS_MODULE \
+            and isinstance(url, six.string_types):
+        project_name = settings.SETTINGS_MODULE.split('.')[0]
+        project_url = project_name + '.' + url
+        yield project_url, args, kwargs
+        if args or kwargs:
+            yield project_url, None, None
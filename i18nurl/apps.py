@@ -0,0 +1,13 @@
+"""Application configuration, for Django 1.7+."""
+from django.apps import AppConfig
+
+
+class I18nURLConfig(AppConfig):
+    name = 'i18nurl'
+    verbose_name = 'i18n URL'
+
+    def ready(self):
+        """Build the index of available languages at startup and, if
+        settings.I18N_WARMUP is True, warm up caches of each language."""
+        from .warmup import startup
+        startup()
@@ -0,0 +1,112 @@
+"""Backends which remember the language users select with SetLanguageView."""
+import logging
+import threading
+
+from django.conf import settings
+from django.core.signals import request_finished
+
+from .middleware import cache_user_language
+from .settings import (I18N_LANGUAGE_BACKENDS, I18N_USER_LANGUAGE_DEFERRED,
+                       I18N_USER_LANGUAGE_FIELD)
+from .utils import import_string
+
+
+logger = logging.getLogger(__name__)
+
+#: Users whose language is saved when the request of the thread finishes.
+_deferred = threading.local()
+
+
+class BaseLanguageBackend(object):
+    def remember(self, request, response, language_code):
+        """Remember language_code as the one selected by request's user.
+
+        ``response`` is the response to request, e.g. to set cookies on.
+
+        """
+        raise NotImplementedError()
+
+
+class UserLanguageBackend(BaseLanguageBackend):
+    """Saves the language field of the authenticated user, named by
+    settings.I18N_USER_LANGUAGE_FIELD.
+
+    Only this column is written, with ``save(update_fields=[field])``, whose
+    ``post_save`` signal makes the language store forget the former
+    language. If settings.I18N_USER_LANGUAGE_DEFERRED is True, the user is
+    saved when the request finishes, i.e. after the response is sent, and
+    errors are logged.
+
+    """
+    def __init__(self, deferred=None):
+        if deferred is None:
+            deferred = I18N_USER_LANGUAGE_DEFERRED
+        self.deferred = deferred
+
+    def remember(self, request, response, language_code):
+        user = getattr(request, 'user', None)
+        if not hasattr(user, I18N_USER_LANGUAGE_FIELD) or user.pk is None:
+            return
+        if getattr(user, I18N_USER_LANGUAGE_FIELD) != language_code:
+            setattr(user, I18N_USER_LANGUAGE_FIELD, language_code)
+            if self.deferred:
+                defer_user_language(user)
+            else:
+                save_user_language(user)
+        cache_user_language(request, response, language_code)
+
+
+def save_user_language(user):
+    """Save the language field of user, only."""
+    user.save(update_fields=[I18N_USER_LANGUAGE_FIELD])
+
+
+def defer_user_language(user):
+    """Save the language field of user when the current request finishes."""
+    users = getattr(_deferred, 'users', None)
+    if users is None:
+        users = _deferred.users = []
+    if user not in users:
+        users.append(user)
+
+
+def save_deferred_user_languages(**kwargs):
+    """Save languages deferred during the request, as a ``request_finished``
+    receiver."""
+    users = getattr(_deferred, 'users', None)
+    if not users:
+        return
+    _deferred.users = []
+    for user in users:
+        try:
+            save_user_language(user)
+        except Exception:
+            logger.exception('Cannot save the language of user %s', user.pk)
+
+
+request_finished.connect(save_deferred_user_languages)
+
+
+class SessionLanguageBackend(BaseLanguageBackend):
+    """Writes the language in the session, or in a cookie if there is no
+    session."""
+    def remember(self, request, response, language_code):
+        if hasattr(request, 'session'):
+            request.session['django_language'] = language_code
+        else:
+            CookieLanguageBackend().remember(request, response,
+                                             language_code)
+
+
+class CookieLanguageBackend(BaseLanguageBackend):
+    """Sets the language cookie on the response."""
+    def remember(self, request, response, language_code):
+        response.set_cookie(settings.LANGUAGE_COOKIE_NAME, language_code)
+
+
+def get_backends(backends=None):
+    """Return instances of backends, which default to those of
+    settings.I18N_LANGUAGE_BACKENDS."""
+    if backends is None:
+        backends = I18N_LANGUAGE_BACKENDS
+    return [import_string(path)() for path in backends]
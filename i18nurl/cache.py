@@ -0,0 +1,83 @@
+"""Bounded in-memory caches, and keys of responses in shared caches."""
+import hashlib
+from collections import OrderedDict
+from threading import Lock
+
+from django.utils import translation
+from django.utils.encoding import force_bytes, iri_to_uri
+
+
+class LRUCache(object):
+    """Thread-safe mapping holding at most ``maxsize`` items.
+
+    When full, the least recently used item is discarded. A ``maxsize`` of 0
+    disables the cache. ``hits`` and ``misses`` count :meth:`get` calls since
+    the last :meth:`clear`.
+
+    """
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        """Return value for key and mark it as recently used, or default."""
+        with self._lock:
+            try:
+                value = self._data.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data[key] = value
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        """Store value for key, discarding the least recently used item if
+        the cache is full."""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = value
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        """Remove all items and reset counters."""
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+def get_cache_key(request, key_prefix=None, method=None):
+    """Return the key of request's response in a cache shared by languages.
+
+    The key depends on the absolute URL and on the language resolved for
+    request, but not on the raw values of the headers the language was
+    resolved from: requests with different Accept-Language or Cookie headers
+    share the response of their language.
+
+    ``key_prefix`` defaults to settings.CACHE_MIDDLEWARE_KEY_PREFIX and
+    ``method`` to request's.
+
+    """
+    if key_prefix is None:
+        from django.conf import settings
+        key_prefix = settings.CACHE_MIDDLEWARE_KEY_PREFIX
+    if method is None:
+        method = request.method
+    language = getattr(request, 'LANGUAGE_CODE', None) \
+        or translation.get_language()
+    url = hashlib.md5(force_bytes(iri_to_uri(request.build_absolute_uri())))
+    return 'i18nurl.cache.%s.%s.%s.%s' % (key_prefix, method,
+                                          url.hexdigest(), language)
@@ -0,0 +1,90 @@
+"""In-process aggregation of language resolution metrics."""
+from bisect import bisect_left
+from threading import Lock
+
+from .signals import language_resolved
+
+
+#: Upper bounds, in nanoseconds, of duration histogram buckets.
+DURATION_BUCKETS = (1000, 10000, 100000, 1000000, 10000000)
+
+
+class LanguageStats(object):
+    """Counters and duration histograms of language resolution, per
+    resolver, fed by ``language_resolved`` signal.
+
+    .. code-block:: python
+
+       from i18nurl.instrumentation import stats
+
+       stats.connect()
+       ...
+       stats.snapshot()
+
+    """
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = Lock()
+        self.reset()
+
+    def connect(self):
+        """Start collecting metrics."""
+        language_resolved.connect(self, dispatch_uid=id(self))
+
+    def disconnect(self):
+        """Stop collecting metrics."""
+        language_resolved.disconnect(dispatch_uid=id(self))
+
+    def reset(self):
+        """Forget collected metrics."""
+        with self._lock:
+            self._resolvers = {}
+
+    def __call__(self, stages=(), **kwargs):
+        """Record the stages of a request, as a ``language_resolved``
+        receiver."""
+        with self._lock:
+            for resolver, language, cache_hit, duration in stages:
+                try:
+                    metrics = self._resolvers[resolver]
+                except KeyError:
+                    metrics = self._resolvers[resolver] = {
+                        'count': 0,
+                        'cache_hits': 0,
+                        'duration': 0,
+                        'languages': {},
+                        'histogram': [0] * (len(self.buckets) + 1),
+                    }
+                metrics['count'] += 1
+                metrics['cache_hits'] += bool(cache_hit)
+                metrics['duration'] += duration
+                languages = metrics['languages']
+                languages[language] = languages.get(language, 0) + 1
+                bucket = bisect_left(self.buckets, duration)
+                metrics['histogram'][bucket] += 1
+
+    def snapshot(self):
+        """Return collected metrics, per resolver name.
+
+        Each resolver has ``count`` of resolutions, ``cache_hits``, total
+        ``duration`` in nanoseconds, counts of resolved ``languages`` (None
+        when the resolver found none) and a duration ``histogram``: a list of
+        (upper bound, count) where the last bound is None.
+
+        """
+        with self._lock:
+            snapshot = {}
+            for resolver, metrics in self._resolvers.items():
+                snapshot[resolver] = {
+                    'count': metrics['count'],
+                    'cache_hits': metrics['cache_hits'],
+                    'duration': metrics['duration'],
+                    'languages': dict(metrics['languages']),
+                    'histogram': list(zip(self.buckets + (None,),
+                                          metrics['histogram'])),
+                }
+            return snapshot
+
+
+#: Default aggregator, to connect at startup.
+stats = LanguageStats()
@@ -0,0 +1,24 @@
+"""Pre-populate i18n caches and report the duration of each phase."""
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from i18nurl.warmup import warmup
+
+
+class Command(BaseCommand):
+    help = __doc__
+    option_list = BaseCommand.option_list + (
+        make_option('--language', action='append', dest='languages',
+                    default=None,
+                    help='Language to warm up, defaults to all of '
+                         'settings.I18N_LANGUAGES. May be repeated.'),
+    )
+
+    def handle(self, *args, **options):
+        total = 0
+        for phase, count, duration in warmup(options['languages']):
+            total += duration
+            self.stdout.write('%s: %d in %.1f ms\n'
+                              % (phase, count, duration * 1000))
+        self.stdout.write('total: %.1f ms\n' % (total * 1000))
@@ -1,39 +1,156 @@
-import locale
-import re
+from timeit import default_timer
 
 from django.conf import settings
-from django.utils import translation
-from django.utils.translation.trans_real import (check_for_language,
-                                                 parse_accept_lang_header,
-                                                 to_locale)
+from django.contrib.auth import SESSION_KEY
+from django.utils import six, translation
 from django.utils.cache import patch_vary_headers
 
-from .utils import is_language_supported
+from .cache import LRUCache
+from .negotiation import get_negotiator, truncate_accept_language
+from .settings import (I18N_ACCEPT_LANGUAGE_CACHE_SIZE,
+                       I18N_LANGUAGE_RESOLVERS, I18N_USER_LANGUAGE_CACHE,
+                       I18N_USER_LANGUAGE_COOKIE_NAME,
+                       I18N_USER_LANGUAGE_FIELD)
+from .signals import language_resolved, setting_changed
+from .stores import get_language_store
+from .utils import activate_language, import_string, is_language_supported
+
+
+#: Marks a missing cache entry, as None is a valid cached value.
+_missing = object()
+
+
+def _resolve(resolver, request):
+    """Return (language code, cache hit) resolver finds for request.
+
+    The headers the language depends on, i.e. the ``vary_headers`` of each
+    resolver asked, are accumulated in ``request.LANGUAGE_VARY``. The
+    resolver which finds the language is recorded in
+    ``request.LANGUAGE_RESOLVER``.
+
+    If receivers are connected to ``language_resolved`` signal, resolution is
+    timed and recorded as a stage in ``request.LANGUAGE_STAGES``.
+
+    """
+    if not language_resolved.receivers:
+        language_code, cache_hit = resolver.resolve_language(request)
+    else:
+        start = default_timer()
+        language_code, cache_hit = resolver.resolve_language(request)
+        duration = int((default_timer() - start) * 1e9)
+        stage = (resolver.__class__.__name__, language_code, cache_hit,
+                 duration)
+        request.LANGUAGE_STAGES = getattr(request, 'LANGUAGE_STAGES',
+                                          ()) + (stage,)
+    vary_headers = getattr(request, 'LANGUAGE_VARY', ())
+    for header in resolver.vary_headers:
+        if header not in vary_headers:
+            vary_headers += (header,)
+    request.LANGUAGE_VARY = vary_headers
+    if language_code and getattr(request, 'LANGUAGE_RESOLVER', None) is None:
+        request.LANGUAGE_RESOLVER = resolver.__class__.__name__
+    return language_code, cache_hit
+
+
+def _add_timing(request, hook, start):
+    """Add the nanoseconds elapsed since start to the duration of hook, in
+    ``request.LANGUAGE_TIMINGS``."""
+    duration = int((default_timer() - start) * 1e9)
+    timings = getattr(request, 'LANGUAGE_TIMINGS', None)
+    if timings is None:
+        timings = request.LANGUAGE_TIMINGS = {}
+    timings[hook] = timings.get(hook, 0) + duration
+
+
+def _send_language_resolved(sender, request):
+    """Send ``language_resolved`` signal for request, once."""
+    if getattr(request, 'LANGUAGE_REPORTED', False):
+        return
+    request.LANGUAGE_REPORTED = True
+    stages = getattr(request, 'LANGUAGE_STAGES', ())
+    timings = getattr(request, 'LANGUAGE_TIMINGS', {})
+    cache_hit = False
+    for name, language_code, stage_hit, duration in stages:
+        if language_code:
+            cache_hit = stage_hit
+            break
+    language_resolved.send(sender=sender, request=request,
+                           resolver=getattr(request, 'LANGUAGE_RESOLVER',
+                                            None),
+                           language=getattr(request, 'LANGUAGE_CODE', None),
+                           cache_hit=cache_hit,
+                           duration=sum(timings.values()),
+                           stages=stages, timings=timings)
 
 
 class BaseLanguageMiddleware(object):
+    #: Request headers the language found by get_language_from_request()
+    #: depends on, patched in the ``Vary`` header of responses.
+    vary_headers = ('Accept-Language',)
+
     def get_language_from_request(self, request):
         raise NotImplementedError()
 
+    def resolve_language(self, request):
+        """Return (language code, cache hit) for request.
+
+        Resolvers which memoize their results override it to report whether
+        the language came from their cache.
+
+        """
+        return self.get_language_from_request(request), False
+
+    def find_language(self, request):
+        """Return (language code, cache hit) for request, as a stage of
+        language resolution."""
+        return _resolve(self, request)
+
     def process_request(self, request):
+        if not language_resolved.receivers:
+            self.activate_request_language(request)
+        else:
+            start = default_timer()
+            self.activate_request_language(request)
+            _add_timing(request, 'process_request', start)
+        return None
+
+    def activate_request_language(self, request):
+        """Find and activate the language of request, unless it is known."""
         language_code = getattr(request, 'LANGUAGE_CODE', None)
         if language_code is None:
-            language_code = self.get_language_from_request(request)
+            language_code = self.find_language(request)[0]
             if language_code:
-                translation.activate(language_code)
+                activate_language(language_code)
                 request.LANGUAGE_CODE = language_code
-        return None
 
     def process_response(self, request, response):
-        patch_vary_headers(response, ('Accept-Language',))
+        if not language_resolved.receivers:
+            return self.finalize_response(request, response)
+        start = default_timer()
+        response = self.finalize_response(request, response)
+        _add_timing(request, 'process_response', start)
+        _send_language_resolved(self.__class__, request)
+        return response
+
+    def finalize_response(self, request, response):
+        """Patch response with the language of request, and deactivate it."""
+        vary_headers = getattr(request, 'LANGUAGE_VARY', self.vary_headers)
+        if vary_headers:
+            patch_vary_headers(response, vary_headers)
         if 'Content-Language' not in response:
             response['Content-Language'] = translation.get_language()
+        uncached_language = getattr(request, 'USER_LANGUAGE_UNCACHED', None)
+        if uncached_language is not None:
+            del request.USER_LANGUAGE_UNCACHED
+            cache_user_language(request, response, uncached_language)
         translation.deactivate()
         return response
 
 
 class DefaultLanguageMiddleware(BaseLanguageMiddleware):
     """Middleware that activate settings.LANGUAGE_CODE."""
+    vary_headers = ()
+
     def get_language_from_request(self, request):
         """Return settings.LANGUAGE_CODE."""
         return settings.LANGUAGE_CODE
@@ -41,25 +158,44 @@ class DefaultLanguageMiddleware(BaseLanguageMiddleware):
 
 class UrlPrefixLanguageMiddleware(BaseLanguageMiddleware):
     """Looks after a language prefix in request.path_info."""
+    vary_headers = ()
+
+    def __init__(self):
+        self.update_prefixes()
+        setting_changed.connect(self.on_setting_changed)
+
+    def update_prefixes(self):
+        """Build the set of language prefixes from settings.LANGUAGES."""
+        self.prefixes = frozenset(code for code, name in settings.LANGUAGES)
+
+    def on_setting_changed(self, setting, **kwargs):
+        """Rebuild language prefixes when settings.LANGUAGES changes."""
+        if setting == 'LANGUAGES':
+            self.update_prefixes()
+
     def get_language_from_request(self, request):
         """Search one of settings.LANGUAGES code in request.path_info."""
-        alternatives = [code for code, name in settings.LANGUAGES]
-        pattern = r'^/(?P<language>%s)(?P<path>/.*|)$' \
-                  % '|'.join(alternatives)
-        match = re.match(pattern, request.path_info)
-        if match is not None:
-            requested_language = match.group('language')
+        path = request.path_info
+        if not path.startswith('/'):
+            return None
+        end = path.find('/', 1)
+        requested_language = path[1:end] if end != -1 else path[1:]
+        if requested_language in self.prefixes:
             return is_language_supported(requested_language)
         return None
 
 
 class CookieLanguageMiddleware(BaseLanguageMiddleware):
+    vary_headers = ('Cookie',)
+
     def get_language_from_request(self, request):
         lang_code = request.COOKIES.get(settings.LANGUAGE_COOKIE_NAME)
         return is_language_supported(lang_code)
 
 
 class SessionLanguageMiddleware(BaseLanguageMiddleware):
+    vary_headers = ('Cookie',)
+
     def get_language_from_request(self, request):
         if hasattr(request, 'session'):
             lang_code = request.session.get('django_language', None)
@@ -68,42 +204,162 @@ class SessionLanguageMiddleware(BaseLanguageMiddleware):
 
 
 class HttpAcceptLanguageMiddleware(BaseLanguageMiddleware):
+    """Negotiates language with the Accept-Language header, see
+    :class:`i18nurl.negotiation.LanguageNegotiator`.
+
+    Negotiated languages are memoized per header value in ``cache``, whose
+    ``hits`` and ``misses`` counters can be read for monitoring. Headers are
+    cut to settings.I18N_ACCEPT_LANGUAGE_MAX_LENGTH characters and
+    settings.I18N_ACCEPT_LANGUAGE_MAX_ENTRIES entries, so that the cost of
+    hostile headers is bounded.
+
+    """
+    cache = LRUCache(I18N_ACCEPT_LANGUAGE_CACHE_SIZE)
+
     def get_language_from_request(self, request):
-        supported = dict(settings.LANGUAGES)
-        accept = request.META.get('HTTP_ACCEPT_LANGUAGE', '')
-        for accept_lang, unused in parse_accept_lang_header(accept):
-            if accept_lang == '*':
-                break
-
-            # We have a very restricted form for our language files
-            # (no encoding specifier, since they all must be UTF-8 and
-            # only one possible language each time. So we avoid the
-            # overhead of gettext.find() and work out the MO file
-            # manually.
-
-            # 'normalized' is the root name of the locale in POSIX
-            # format (which is the format used for the directories
-            # holding the MO files).
-            normalized = locale.locale_alias.get(to_locale(accept_lang, True))
-            if not normalized:
-                continue
-            # Remove the default encoding from locale_alias.
-            normalized = normalized.split('.')[0]
-
-            for lang_code in (accept_lang, accept_lang.split('-')[0]):
-                lang_code = lang_code.lower()
-                if lang_code in supported and check_for_language(lang_code):
-                    return lang_code
+        return self.resolve_language(request)[0]
+
+    def resolve_language(self, request):
+        accept = truncate_accept_language(
+            request.META.get('HTTP_ACCEPT_LANGUAGE', ''))
+        language_code = self.cache.get(accept, _missing)
+        if language_code is not _missing:
+            return language_code, True
+        language_code = self.negotiate(accept)
+        self.cache.set(accept, language_code)
+        return language_code, False
+
+    def negotiate(self, accept):
+        """Return the supported language best matching accept header."""
+        return get_negotiator().negotiate(accept)
+
+
+def clear_accept_language_cache(setting, **kwargs):
+    """Forget negotiated languages when available languages change."""
+    if setting in ('LANGUAGES', 'I18N_LANGUAGES', 'LOCALE_PATHS'):
+        HttpAcceptLanguageMiddleware.cache.clear()
+
+
+setting_changed.connect(clear_accept_language_cache)
+
+
+#: Salt of the signed cookie holding the language cached for the
+#: authenticated user.
+USER_LANGUAGE_COOKIE_SALT = 'i18nurl.user_language'
+
+
+def get_cached_user_language(request):
+    """Return the language cached in a signed cookie for the authenticated
+    user of request, '' if they have none, or None if it is not cached."""
+    user_id = request.session.get(SESSION_KEY)
+    if user_id is None:
         return None
+    cached = request.get_signed_cookie(I18N_USER_LANGUAGE_COOKIE_NAME,
+                                       default=None,
+                                       salt=USER_LANGUAGE_COOKIE_SALT,
+                                       max_age=settings.SESSION_COOKIE_AGE)
+    if cached is not None:
+        cached = cached.rsplit(':', 1)
+        if cached[0] == six.text_type(user_id):
+            return cached[1]
+    return None
+
+
+def cache_user_language(request, response, language):
+    """Cache language as the one of request's authenticated user, in a signed
+    cookie set on response, if settings.I18N_USER_LANGUAGE_CACHE is
+    ``'cookie'``."""
+    if I18N_USER_LANGUAGE_CACHE != 'cookie' or response is None or \
+            not hasattr(request, 'session'):
+        return
+    user_id = request.session.get(SESSION_KEY)
+    if user_id is None:
+        return
+    response.set_signed_cookie(I18N_USER_LANGUAGE_COOKIE_NAME,
+                               '%s:%s' % (user_id, language or ''),
+                               salt=USER_LANGUAGE_COOKIE_SALT,
+                               max_age=settings.SESSION_COOKIE_AGE)
 
 
 class UserLanguageMiddleware(BaseLanguageMiddleware):
+    """Reads the language attribute of request.user, named by
+    settings.I18N_USER_LANGUAGE_FIELD.
+
+    Loading request.user costs a session read and a database query. Unless
+    settings.I18N_USER_LANGUAGE_CACHE is None, the language of the user
+    authenticated by the session is read without loading the user:
+
+    * ``'store'``: from the language store of settings.I18N_LANGUAGE_STORE,
+      which forgets users when they are saved,
+    * ``'cookie'``: from a signed cookie, set from the user on a miss and by
+      SetLanguageView. Changes made elsewhere show once the cookie is set
+      again.
+
+    Users authenticated otherwise, e.g. by RemoteUserMiddleware, are loaded.
+
+    """
+    vary_headers = ('Cookie',)
+
     def get_language_from_request(self, request):
+        return self.resolve_language(request)[0]
+
+    def resolve_language(self, request):
+        if not I18N_USER_LANGUAGE_CACHE or not hasattr(request, 'session'):
+            return self.get_user_language(request), False
+        user_id = request.session.get(SESSION_KEY)
+        if user_id is None:
+            return self.get_user_language(request), False
+        if I18N_USER_LANGUAGE_CACHE == 'store':
+            language = get_language_store().get_language(user_id)
+        else:
+            language = get_cached_user_language(request)
+            if language is None:
+                language = self.get_user_language(request)
+                # Set in the cookie as the response is processed.
+                request.USER_LANGUAGE_UNCACHED = language or ''
+                return language, False
+        return is_language_supported(language) or None, True
+
+    def get_user_language(self, request):
+        """Return the supported language of request.user, loading it."""
         user = request.user
         requested_language = None
-        if hasattr(user, 'language_code'):
-            requested_language = user.language_code
+        if hasattr(user, I18N_USER_LANGUAGE_FIELD):
+            requested_language = getattr(user, I18N_USER_LANGUAGE_FIELD)
         language = is_language_supported(requested_language)
         if language:
             return language
         return None
+
+
+class ChainedLanguageMiddleware(BaseLanguageMiddleware):
+    """Middleware that tries several language resolvers in a single pass.
+
+    Resolvers are other language middlewares, tried in the order of
+    settings.I18N_LANGUAGE_RESOLVERS until one of them returns a language.
+    The language is activated and the response is patched only once, with
+    the ``vary_headers`` of the resolvers asked.
+
+    """
+    vary_headers = ()
+
+    def __init__(self, resolvers=None):
+        if resolvers is None:
+            resolvers = I18N_LANGUAGE_RESOLVERS
+        self.resolvers = [import_string(path)() for path in resolvers]
+
+    def get_language_from_request(self, request):
+        """Return the language of the first resolver which finds one."""
+        return self.resolve_language(request)[0]
+
+    def find_language(self, request):
+        """Return (language code, cache hit) for request, each resolver
+        being a stage of language resolution."""
+        return self.resolve_language(request)
+
+    def resolve_language(self, request):
+        for resolver in self.resolvers:
+            language_code, cache_hit = _resolve(resolver, request)
+            if language_code:
+                return language_code, cache_hit
+        return None, False
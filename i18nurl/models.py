@@ -1 +1,8 @@
-# I am empty but I need to be there to make i18nurl a django app
+"""i18nurl has no models: this module makes it a Django app and connects
+signal receivers."""
+from django.db.models.signals import post_save
+
+from .stores import forget_user_language
+
+
+post_save.connect(forget_user_language)
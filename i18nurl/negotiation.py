@@ -0,0 +1,132 @@
+"""Parsing of Accept-Language headers, with bounded cost, and language
+negotiation."""
+from django.utils.translation.trans_real import accept_language_re
+
+from .settings import (I18N_ACCEPT_LANGUAGE_MAX_ENTRIES,
+                       I18N_ACCEPT_LANGUAGE_MAX_LENGTH)
+from .signals import setting_changed
+from .utils import get_available_languages
+
+
+#: Negotiator of settings.LANGUAGES, built on first use.
+_negotiator = None
+
+
+def truncate_accept_language(accept,
+                             max_length=I18N_ACCEPT_LANGUAGE_MAX_LENGTH):
+    """Return accept header cut to its entries within max_length characters.
+
+    A ``max_length`` of 0 disables the limit.
+
+    """
+    if not max_length or len(accept) <= max_length:
+        return accept
+    if accept[max_length] == ',':
+        return accept[:max_length]
+    end = accept.rfind(',', 0, max_length)
+    return accept[:end] if end != -1 else ''
+
+
+def iter_accept_language(accept,
+                         max_length=I18N_ACCEPT_LANGUAGE_MAX_LENGTH,
+                         max_entries=I18N_ACCEPT_LANGUAGE_MAX_ENTRIES):
+    """Yield (language, q-value) of accept header entries, in header order.
+
+    Unlike Django's ``parse_accept_lang_header()``, entries are neither
+    stored nor sorted, at most max_length characters and max_entries entries
+    are parsed, and parsing stops at the first malformed entry. Limits of 0
+    are disabled.
+
+    """
+    accept = truncate_accept_language(accept, max_length)
+    position = 0
+    count = 0
+    while position < len(accept):
+        if max_entries and count >= max_entries:
+            return
+        match = accept_language_re.match(accept, position)
+        if match is None:
+            return
+        language, quality = match.groups()
+        try:
+            quality = float(quality) if quality else 1.0
+        except ValueError:  # accept_language_re matches e.g. "q=1a".
+            return
+        yield language, quality
+        count += 1
+        position = match.end()
+
+
+class LanguageNegotiator(object):
+    """Match Accept-Language headers against a list of language codes.
+
+    Language ranges are matched as in the "lookup" scheme of RFC 4647: the
+    range, then the range without its last subtag, and so on. A primary
+    subtag also matches the first regional language it is the prefix of,
+    e.g. ``pt`` matches ``pt-br`` if ``pt`` itself is not in ``languages``.
+
+    """
+    def __init__(self, languages):
+        self.languages = tuple(languages)
+        #: Language code, per lowercase tag it matches.
+        self.lookup = {}
+        for code in self.languages:
+            self.lookup[code.lower()] = code
+        for code in self.languages:
+            self.lookup.setdefault(code.lower().split('-')[0], code)
+
+    def match(self, language_range):
+        """Return the language code matching language_range, or None."""
+        tag = language_range.lower()
+        while True:
+            try:
+                return self.lookup[tag]
+            except KeyError:
+                end = tag.rfind('-')
+                if end == -1:
+                    return None
+                tag = tag[:end]
+
+    def negotiate(self, accept):
+        """Return the language code best matching accept header, or None.
+
+        Entries are parsed once, in header order: the first of the entries
+        with the highest q-value which matches wins, unless ``*`` ranks
+        before it. Entries with a q-value of 0 are not acceptable.
+
+        """
+        best_quality, best_language = 0, None
+        for language_range, quality in iter_accept_language(accept):
+            if quality <= best_quality:
+                continue
+            if language_range == '*':
+                best_quality, best_language = quality, None
+                continue
+            language = self.match(language_range)
+            if language is not None:
+                best_quality, best_language = quality, language
+                if quality >= 1:
+                    break
+        return best_language
+
+
+def get_negotiator():
+    """Return the negotiator of settings.LANGUAGES codes which have a
+    translation catalog."""
+    global _negotiator
+    if _negotiator is None:
+        from django.conf import settings
+        available = get_available_languages()
+        _negotiator = LanguageNegotiator(
+            code for code, name in settings.LANGUAGES if code in available)
+    return _negotiator
+
+
+def clear_negotiator(setting, **kwargs):
+    """Forget the negotiator when available languages change."""
+    global _negotiator
+    if setting in ('LANGUAGES', 'I18N_LANGUAGES', 'LOCALE_PATHS'):
+        _negotiator = None
+
+
+setting_changed.connect(clear_negotiator)
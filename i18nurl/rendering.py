@@ -0,0 +1,40 @@
+"""Render a template for many recipients, e.g. mass mails or exports."""
+from itertools import groupby
+
+from django.template import Context
+from django.template.context import BaseContext
+from django.template.loader import get_template
+from django.utils import six, translation
+
+from . import url_cache
+from .utils import override_language
+
+
+def render_by_language(template, items):
+    """Return the renderings of template for each (context, language) of
+    items, in order.
+
+    ``template`` is a template or its name, contexts are contexts or dicts,
+    languages which are None mean the active language. Items are rendered
+    grouped by language, so that each language is activated once, and URLs
+    reversed by i18nurl tags are shared by all renderings.
+
+    """
+    if isinstance(template, six.string_types):
+        template = get_template(template)
+    items = list(items)
+
+    def get_language(index):
+        return items[index][1] or ''
+
+    order = sorted(range(len(items)), key=get_language)
+    renderings = [None] * len(items)
+    with url_cache():
+        for language, indexes in groupby(order, key=get_language):
+            with override_language(language or translation.get_language()):
+                for index in indexes:
+                    context = items[index][0]
+                    if not isinstance(context, BaseContext):
+                        context = Context(context)
+                    renderings[index] = template.render(context)
+    return renderings
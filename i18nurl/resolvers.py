@@ -0,0 +1,193 @@
+"""URL resolvers bound to a language, to reverse URLs in any language without
+activating it."""
+from django.core.urlresolvers import (NoReverseMatch, RegexURLResolver,
+                                      get_resolver, get_script_prefix,
+                                      get_urlconf)
+from django.utils import six
+from django.utils.encoding import iri_to_uri
+from django.utils.translation.trans_real import to_language
+
+from .settings import I18N_LANGUAGES
+from .utils import override_language
+
+
+#: Language resolvers, per (URLconf, language code).
+_language_resolvers = {}
+
+#: Namespace resolvers, per (namespace pattern, resolver, language code).
+_ns_resolvers = {}
+
+#: Django resolvers the language resolvers were built for, per URLconf.
+_root_resolvers = {}
+
+
+class LanguageURLResolver(RegexURLResolver):
+    """URL resolver whose patterns are translated in ``language``, whatever
+    the active language is."""
+    def __init__(self, regex, urlconf_name, language, **kwargs):
+        super(LanguageURLResolver, self).__init__(regex, urlconf_name,
+                                                  **kwargs)
+        self.language_code = to_language(language)
+
+    def _populate(self):
+        # Lazy patterns are translated in the active language. Populating is
+        # synchronous, so no other code sees the language activated meanwhile.
+        with override_language(self.language_code):
+            super(LanguageURLResolver, self)._populate()
+
+    def resolve(self, path):
+        with override_language(self.language_code):
+            return super(LanguageURLResolver, self).resolve(path)
+
+    @property
+    def reverse_dict(self):
+        return get_language_dicts(self, self.language_code)[0]
+
+    @property
+    def namespace_dict(self):
+        return get_language_dicts(self, self.language_code)[1]
+
+    @property
+    def app_dict(self):
+        return get_language_dicts(self, self.language_code)[2]
+
+
+def get_language_dicts(resolver, language_code):
+    """Return (reverse_dict, namespace_dict, app_dict) of resolver, with
+    patterns translated in language_code."""
+    if language_code not in resolver._reverse_dict:
+        with override_language(language_code):
+            resolver._populate()
+    return (resolver._reverse_dict[language_code],
+            resolver._namespace_dict[language_code],
+            resolver._app_dict[language_code])
+
+
+def get_language_resolver(language, urlconf=None):
+    """Return the resolver of urlconf bound to language.
+
+    Resolvers are built once per URLconf and language, until URLconf caches
+    are cleared.
+
+    """
+    if urlconf is None:
+        urlconf = get_urlconf()
+    root_resolver = get_resolver(urlconf)
+    cached_root_resolver = _root_resolvers.get(urlconf)
+    if cached_root_resolver is not root_resolver:
+        if cached_root_resolver is not None:
+            _language_resolvers.clear()
+            _ns_resolvers.clear()
+            _root_resolvers.clear()
+        _root_resolvers[urlconf] = root_resolver
+    language_code = to_language(language)
+    key = (urlconf, language_code)
+    try:
+        return _language_resolvers[key]
+    except KeyError:
+        resolver = LanguageURLResolver(r'^/', root_resolver.urlconf_name,
+                                       language_code)
+        _language_resolvers[key] = resolver
+        return resolver
+
+
+def warm_resolvers(languages=None, urlconf=None):
+    """Build and populate the resolvers of urlconf for languages, which
+    default to codes of settings.I18N_LANGUAGES.
+
+    Patterns of urlconf are shared with Django's resolver, so that their
+    regexes are compiled for forward resolution too.
+
+    """
+    if languages is None:
+        languages = [code for code, name in I18N_LANGUAGES]
+    if urlconf is None:
+        urlconf = get_urlconf()
+    for language in languages:
+        resolver = get_language_resolver(language, urlconf)
+        get_language_dicts(resolver, resolver.language_code)
+        get_language_dicts(get_resolver(urlconf), resolver.language_code)
+
+
+def get_ns_resolver(ns_pattern, resolver, language_code):
+    """Return a resolver bound to language_code, for patterns of resolver
+    prefixed by ns_pattern."""
+    key = (ns_pattern, resolver, language_code)
+    try:
+        return _ns_resolvers[key]
+    except KeyError:
+        ns_resolver = LanguageURLResolver(ns_pattern, resolver.url_patterns,
+                                          language_code)
+        _ns_resolvers[key] = LanguageURLResolver(r'^/', [ns_resolver],
+                                                 language_code)
+        return _ns_resolvers[key]
+
+
+def reverse(viewname, language, urlconf=None, args=None, kwargs=None,
+            prefix=None, current_app=None):
+    """Return the url of viewname in language, as Django's ``reverse()``
+    would with language active.
+
+    The active language is only switched while the resolvers of language are
+    populated, on first use unless :func:`warm_resolvers` ran, and restored
+    before returning.
+
+    """
+    if urlconf is None:
+        urlconf = get_urlconf()
+    resolver = get_language_resolver(language, urlconf)
+    language_code = resolver.language_code
+    args = args or []
+    kwargs = kwargs or {}
+
+    if prefix is None:
+        prefix = get_script_prefix()
+
+    if not isinstance(viewname, six.string_types):
+        view = viewname
+    else:
+        parts = viewname.split(':')
+        parts.reverse()
+        view = parts[0]
+        path = parts[1:]
+
+        resolved_path = []
+        ns_pattern = ''
+        while path:
+            ns = path.pop()
+            reverse_dict, namespace_dict, app_dict = get_language_dicts(
+                resolver, language_code)
+
+            # Lookup the name to see if it could be an app identifier
+            try:
+                app_list = app_dict[ns]
+                # Yes! Path part matches an app in the current Resolver
+                if current_app and current_app in app_list:
+                    # If we are reversing for a particular app,
+                    # use that namespace
+                    ns = current_app
+                elif ns not in app_list:
+                    # The name isn't shared by one of the instances
+                    # (i.e., the default) so just pick the first instance
+                    # as the default.
+                    ns = app_list[0]
+            except KeyError:
+                pass
+
+            try:
+                extra, resolver = namespace_dict[ns]
+                resolved_path.append(ns)
+                ns_pattern = ns_pattern + extra
+            except KeyError as key:
+                if resolved_path:
+                    raise NoReverseMatch(
+                        "%s is not a registered namespace inside '%s'" %
+                        (key, ':'.join(resolved_path)))
+                else:
+                    raise NoReverseMatch("%s is not a registered namespace" %
+                                         key)
+        if ns_pattern:
+            resolver = get_ns_resolver(ns_pattern, resolver, language_code)
+
+    return iri_to_uri(resolver._reverse_with_prefix(view, prefix, *args,
+                                                    **kwargs))
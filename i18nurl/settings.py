@@ -5,3 +5,55 @@ I18N_LANGUAGES = getattr(settings, 'I18N_LANGUAGES',
 
 I18N_REDIRECT_URL_NAME = getattr(settings, 'I18N_REDIRECT_URL_NAME',
                                  'home')
+
+I18N_LANGUAGE_CACHE_SIZE = getattr(settings, 'I18N_LANGUAGE_CACHE_SIZE',
+                                   1024)
+
+I18N_ACCEPT_LANGUAGE_CACHE_SIZE = getattr(
+    settings, 'I18N_ACCEPT_LANGUAGE_CACHE_SIZE', 512)
+
+I18N_ACCEPT_LANGUAGE_MAX_LENGTH = getattr(
+    settings, 'I18N_ACCEPT_LANGUAGE_MAX_LENGTH', 500)
+
+I18N_ACCEPT_LANGUAGE_MAX_ENTRIES = getattr(
+    settings, 'I18N_ACCEPT_LANGUAGE_MAX_ENTRIES', 32)
+
+I18N_REVERSE_CACHE_SIZE = getattr(settings, 'I18N_REVERSE_CACHE_SIZE', 0)
+
+I18N_NO_REVERSE_CACHE_SIZE = getattr(settings, 'I18N_NO_REVERSE_CACHE_SIZE',
+                                     256)
+
+I18N_REVERSE_FALLBACK = getattr(settings, 'I18N_REVERSE_FALLBACK', 'project')
+
+I18N_LANGUAGE_RESOLVERS = getattr(settings, 'I18N_LANGUAGE_RESOLVERS', (
+    'i18nurl.middleware.UrlPrefixLanguageMiddleware',
+    'i18nurl.middleware.UserLanguageMiddleware',
+    'i18nurl.middleware.SessionLanguageMiddleware',
+    'i18nurl.middleware.CookieLanguageMiddleware',
+    'i18nurl.middleware.HttpAcceptLanguageMiddleware',
+    'i18nurl.middleware.DefaultLanguageMiddleware',
+))
+
+I18N_USER_LANGUAGE_FIELD = getattr(settings, 'I18N_USER_LANGUAGE_FIELD',
+                                   'language_code')
+
+I18N_LANGUAGE_STORE = getattr(settings, 'I18N_LANGUAGE_STORE',
+                              'i18nurl.stores.ModelLanguageStore')
+
+I18N_LANGUAGE_STORE_CACHE = getattr(settings, 'I18N_LANGUAGE_STORE_CACHE',
+                                    'default')
+
+I18N_USER_LANGUAGE_CACHE = getattr(settings, 'I18N_USER_LANGUAGE_CACHE', None)
+
+I18N_USER_LANGUAGE_COOKIE_NAME = getattr(
+    settings, 'I18N_USER_LANGUAGE_COOKIE_NAME', 'i18nurl_user_language')
+
+I18N_LANGUAGE_BACKENDS = getattr(settings, 'I18N_LANGUAGE_BACKENDS', (
+    'i18nurl.backends.UserLanguageBackend',
+    'i18nurl.backends.SessionLanguageBackend',
+))
+
+I18N_USER_LANGUAGE_DEFERRED = getattr(settings, 'I18N_USER_LANGUAGE_DEFERRED',
+                                      False)
+
+I18N_WARMUP = getattr(settings, 'I18N_WARMUP', False)
@@ -0,0 +1,30 @@
+"""Signals used and sent by i18nurl."""
+from django.dispatch import Signal
+
+try:
+    from django.core.signals import setting_changed
+except ImportError:  # Django < 1.8.
+    from django.test.signals import setting_changed
+
+
+#: Sent once per request by language middlewares, as the response is
+#: processed, with:
+#:
+#: * ``resolver``: name of the resolver which found the language, or None,
+#: * ``language``: the language code of the request, or None,
+#: * ``cache_hit``: whether the language came from a cache,
+#: * ``duration``: nanoseconds spent in process_request and process_response,
+#: * ``stages``: a (resolver, language, cache hit, nanoseconds) tuple per
+#:   resolver asked, in order,
+#: * ``timings``: nanoseconds spent in each of ``'process_request'`` and
+#:   ``'process_response'``.
+#:
+#: Durations come from :func:`timeit.default_timer`: on Python 2, except on
+#: Windows, it is :func:`time.time`, whose resolution is about a microsecond
+#: and which follows system clock adjustments.
+language_resolved = Signal(providing_args=['request', 'resolver', 'language',
+                                           'cache_hit', 'duration', 'stages',
+                                           'timings'])
+
+
+__all__ = ['language_resolved', 'setting_changed']
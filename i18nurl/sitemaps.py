@@ -0,0 +1,197 @@
+"""Multilingual sitemaps, with alternate links, generated in parallel.
+
+.. code-block:: python
+
+   from i18nurl.sitemaps import write_sitemaps
+
+   entries = (('article', (), {'slug': slug}) for slug in slugs)
+   write_sitemaps(entries, 'var/sitemaps', 'https://example.com')
+
+"""
+from __future__ import unicode_literals
+
+import io
+import os
+from collections import deque
+from itertools import islice
+from multiprocessing import Pool, cpu_count
+from xml.sax.saxutils import escape, quoteattr
+
+from . import reverse_i18n_isolated
+from .resolvers import warm_resolvers
+from .settings import I18N_LANGUAGES
+
+
+#: Maximum number of URLs in a sitemap, as per the sitemaps protocol.
+SHARD_SIZE = 50000
+
+#: Maximum size of a sitemap in bytes, as per the sitemaps protocol.
+MAX_BYTES = 50 * 1024 * 1024
+
+SITEMAP_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9"'
+    ' xmlns:xhtml="http://www.w3.org/1999/xhtml">\n')
+
+SITEMAP_FOOTER = '</urlset>\n'
+
+INDEX_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n')
+
+INDEX_FOOTER = '</sitemapindex>\n'
+
+
+def iter_sitemap(entries, base_url='', languages=None):
+    """Yield the XML sitemap of entries, chunk by chunk.
+
+    Entries are (view name, args, kwargs), reversed in each of languages,
+    which default to codes of settings.I18N_LANGUAGES. Each language gets a
+    ``<url>``, with alternate links to all languages. URLs are prefixed with
+    base_url, e.g. ``'https://example.com'``.
+
+    """
+    yield SITEMAP_HEADER
+    for element in _iter_urls(entries, base_url, languages):
+        yield element
+    yield SITEMAP_FOOTER
+
+
+def write_sitemaps(entries, directory, base_url='', sitemap_url=None,
+                   languages=None, processes=None, shard_size=SHARD_SIZE,
+                   max_bytes=MAX_BYTES):
+    """Write sitemaps of entries in directory, return their file names.
+
+    Entries are split in shards of at most shard_size URLs, written by a pool
+    of processes (as many as CPUs by default, none if 1), each warming its
+    own URL resolvers. Entries are read as shards are submitted, at most two
+    per process ahead of the shards written. Shards are written to
+    ``sitemap-1.xml``, ``sitemap-2.xml``... and split further, e.g. in
+    ``sitemap-1-2.xml``, so that no file exceeds max_bytes. ``sitemap.xml``
+    indexes them, at sitemap_url, which defaults to base_url.
+
+    See :func:`iter_sitemap` about entries, base_url and languages. Raise
+    ValueError if there is no language.
+
+    """
+    if languages is None:
+        languages = [code for code, name in I18N_LANGUAGES]
+    if not languages:
+        raise ValueError('No languages to write sitemaps in.')
+    if sitemap_url is None:
+        sitemap_url = base_url
+    per_shard = max(1, shard_size // len(languages))
+    tasks = _iter_tasks(entries, directory, base_url, languages, per_shard,
+                        max_bytes)
+    file_names = []
+    if processes == 1:
+        _init_worker(languages)
+        for names in map(_write_sitemap, tasks):
+            file_names.extend(names)
+    else:
+        pool = Pool(processes, _init_worker, (languages,))
+        try:
+            window = 2 * (processes or cpu_count())
+            for names in _imap_bounded(pool, _write_sitemap, tasks, window):
+                file_names.extend(names)
+        finally:
+            pool.close()
+            pool.join()
+    with io.open(os.path.join(directory, 'sitemap.xml'), 'w',
+                 encoding='utf-8') as index:
+        index.write(INDEX_HEADER)
+        for file_name in file_names:
+            index.write('<sitemap><loc>%s</loc></sitemap>\n'
+                        % escape('%s/%s' % (sitemap_url, file_name)))
+        index.write(INDEX_FOOTER)
+    return file_names
+
+
+def _iter_urls(entries, base_url, languages):
+    """Yield the ``<url>`` elements of entries, see :func:`iter_sitemap`."""
+    if languages is None:
+        languages = [code for code, name in I18N_LANGUAGES]
+    for view_name, args, kwargs in entries:
+        urls = [(language, base_url + reverse_i18n_isolated(
+            view_name, language, args=args, kwargs=kwargs))
+            for language in languages]
+        alternates = ''.join(
+            '<xhtml:link rel="alternate" hreflang=%s href=%s/>'
+            % (quoteattr(language), quoteattr(url))
+            for language, url in urls)
+        for language, url in urls:
+            yield '<url><loc>%s</loc>%s</url>\n' % (escape(url), alternates)
+
+
+def _imap_bounded(pool, func, iterable, window):
+    """Yield func(item) for items of iterable, in order, computed by pool.
+
+    Unlike ``pool.imap()``, which consumes iterable as fast as it can, at
+    most window items are submitted ahead of the results yielded.
+
+    """
+    pending = deque()
+    for item in iterable:
+        if len(pending) >= window:
+            yield pending.popleft().get()
+        pending.append(pool.apply_async(func, (item,)))
+    while pending:
+        yield pending.popleft().get()
+
+
+def _iter_tasks(entries, directory, base_url, languages, per_shard,
+                max_bytes):
+    """Yield arguments of :func:`_write_sitemap`, per_shard entries each."""
+    entries = iter(entries)
+    number = 0
+    while True:
+        shard = list(islice(entries, per_shard))
+        if not shard:
+            return
+        number += 1
+        yield directory, number, shard, base_url, languages, max_bytes
+
+
+def _init_worker(languages):
+    """Warm URL resolvers of languages, once per worker."""
+    warm_resolvers(languages)
+
+
+def _write_sitemap(task):
+    """Write the sitemaps of a task, return their file names.
+
+    A new file is started when the next ``<url>`` would make the current
+    one exceed max_bytes.
+
+    """
+    directory, number, entries, base_url, languages, max_bytes = task
+    header = SITEMAP_HEADER.encode('utf-8')
+    footer = SITEMAP_FOOTER.encode('utf-8')
+    file_names = []
+    sitemap = None
+    size = 0
+    try:
+        for element in _iter_urls(entries, base_url, languages):
+            element = element.encode('utf-8')
+            if sitemap is None or (
+                    size + len(element) + len(footer) > max_bytes and
+                    size > len(header)):
+                if sitemap is not None:
+                    sitemap.write(footer)
+                    sitemap.close()
+                if file_names:
+                    file_name = 'sitemap-%d-%d.xml' % (number,
+                                                       len(file_names) + 1)
+                else:
+                    file_name = 'sitemap-%d.xml' % number
+                sitemap = io.open(os.path.join(directory, file_name), 'wb')
+                file_names.append(file_name)
+                sitemap.write(header)
+                size = len(header)
+            sitemap.write(element)
+            size += len(element)
+        sitemap.write(footer)
+    finally:
+        if sitemap is not None:
+            sitemap.close()
+    return file_names
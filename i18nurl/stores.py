@@ -0,0 +1,144 @@
+"""Stores of users' languages, with bulk lookups for batch jobs.
+
+.. code-block:: python
+
+   from i18nurl.stores import get_languages
+
+   languages = get_languages([1, 2, 3])  # {1: 'fr', 2: None, 3: 'de'}
+
+"""
+from django.conf import settings
+from django.utils import six
+
+from .settings import (I18N_LANGUAGE_STORE, I18N_LANGUAGE_STORE_CACHE,
+                       I18N_USER_LANGUAGE_FIELD)
+from .utils import import_string, is_language_supported
+
+try:
+    from django.core.cache import caches
+except ImportError:  # Django < 1.7.
+    from django.core.cache import get_cache
+else:
+    def get_cache(alias):
+        return caches[alias]
+
+
+#: Store of settings.I18N_LANGUAGE_STORE, built on first use.
+_language_store = None
+
+
+class BaseLanguageStore(object):
+    def get_languages(self, user_ids):
+        """Return a mapping of user_ids to their supported language code, or
+        None if they have none."""
+        raise NotImplementedError()
+
+    def get_language(self, user_id):
+        """Return the supported language code of user_id, or None."""
+        return self.get_languages([user_id]).get(user_id)
+
+    def forget(self, user_ids):
+        """Drop what is known about languages of user_ids, e.g. when they
+        change."""
+
+
+class ModelLanguageStore(BaseLanguageStore):
+    """Reads languages from a field of the user model, with one query per
+    ``chunk_size`` users."""
+    chunk_size = 500
+
+    def __init__(self, model=None, field=I18N_USER_LANGUAGE_FIELD):
+        self._model = model
+        self.field = field
+
+    @property
+    def model(self):
+        if self._model is None:
+            from django.contrib.auth import get_user_model
+            self._model = get_user_model()
+        return self._model
+
+    def get_languages(self, user_ids):
+        user_ids = list(user_ids)
+        languages = dict.fromkeys(user_ids)
+        # Results are keyed by the ids passed, e.g. strings read from a
+        # session, rather than by primary keys as the database returns them.
+        ids = dict((six.text_type(user_id), user_id) for user_id in user_ids)
+        manager = self.model._default_manager
+        for start in range(0, len(user_ids), self.chunk_size):
+            rows = manager.filter(
+                pk__in=user_ids[start:start + self.chunk_size]) \
+                .values_list('pk', self.field)
+            for pk, language in rows:
+                user_id = ids[six.text_type(pk)]
+                languages[user_id] = is_language_supported(language) or None
+        return languages
+
+
+class CacheLanguageStore(BaseLanguageStore):
+    """Reads languages from a Django cache with a single ``get_many()``, then
+    misses from ``store``, which defaults to a :class:`ModelLanguageStore`,
+    and caches them for ``timeout`` seconds (the cache's default if None)."""
+    key_prefix = 'i18nurl.language.'
+
+    def __init__(self, store=None, cache_alias=I18N_LANGUAGE_STORE_CACHE,
+                 timeout=None):
+        self.store = store if store is not None else ModelLanguageStore()
+        self.cache_alias = cache_alias
+        self.timeout = timeout
+
+    @property
+    def cache(self):
+        return get_cache(self.cache_alias)
+
+    def get_key(self, user_id):
+        return '%s%s' % (self.key_prefix, user_id)
+
+    def get_languages(self, user_ids):
+        keys = dict((self.get_key(user_id), user_id) for user_id in user_ids)
+        languages = {}
+        for key, language in self.cache.get_many(list(keys)).items():
+            languages[keys.pop(key)] = is_language_supported(language) or None
+        if keys:
+            missing = self.store.get_languages(keys.values())
+            languages.update(missing)
+            # Users without language are cached too, as ''.
+            values = dict((self.get_key(user_id), language or '')
+                          for user_id, language in missing.items())
+            if self.timeout is None:
+                self.cache.set_many(values)
+            else:
+                self.cache.set_many(values, self.timeout)
+        return languages
+
+    def forget(self, user_ids):
+        self.cache.delete_many([self.get_key(user_id)
+                                for user_id in user_ids])
+        self.store.forget(user_ids)
+
+
+def get_language_store():
+    """Return the store of settings.I18N_LANGUAGE_STORE."""
+    global _language_store
+    if _language_store is None:
+        _language_store = import_string(I18N_LANGUAGE_STORE)()
+    return _language_store
+
+
+def get_languages(user_ids):
+    """Return a mapping of user_ids to their supported language code, or None
+    if they have none, read from settings.I18N_LANGUAGE_STORE."""
+    return get_language_store().get_languages(user_ids)
+
+
+def forget_user_language(sender, instance, update_fields=None, **kwargs):
+    """Make the language store forget the language of a saved user, as a
+    ``post_save`` receiver."""
+    opts = sender._meta
+    if '%s.%s' % (opts.app_label, opts.object_name) != \
+            settings.AUTH_USER_MODEL:
+        return
+    if update_fields is not None and \
+            I18N_USER_LANGUAGE_FIELD not in update_fields:
+        return
+    get_language_store().forget([instance.pk])
@@ -1,14 +1,27 @@
 # -*- coding: utf-8 -*-
-from django.conf import settings
-from django.template.base import Library, TemplateSyntaxError, kwarg_re, Node
+from django.template.base import (Library, TemplateSyntaxError, Variable,
+                                  kwarg_re, Node)
 from django.utils.encoding import smart_text
-from django.core.urlresolvers import NoReverseMatch
+from django.utils.html import format_html
+from django.utils.safestring import mark_safe
+from django.core.urlresolvers import (NoReverseMatch, get_resolver,
+                                      get_script_prefix, get_urlconf)
 
-from .. import reverse_i18n
+from .. import reverse_i18n, reverse_i18n_all
+from ..utils import is_language_available
 
 register = Library()
 
 
+def is_constant(expression):
+    """Return True if compiled filter expression is a literal without
+    filters, i.e. it resolves to the same value in any context."""
+    if expression.filters:
+        return False
+    return not isinstance(expression.var, Variable) \
+        or expression.var.literal is not None
+
+
 class URLNode(Node):
     def __init__(self, view_name, language, args, kwargs, asvar):
         self.view_name = view_name
@@ -16,8 +29,33 @@ class URLNode(Node):
         self.args = args
         self.kwargs = kwargs
         self.asvar = asvar
+        #: If all arguments are constant, the URL is reversed on first render
+        #: and kept in ``cached_url`` along with the state it depends on.
+        self.constant = all(is_constant(expression) for expression in
+                            [view_name, language] + args +
+                            list(kwargs.values()))
+        self.cached_url = None
 
     def render(self, context):
+        if self.constant:
+            state = (get_resolver(get_urlconf()), get_script_prefix(),
+                     context.current_app)
+            cached_url = self.cached_url
+            if cached_url is not None and cached_url[0] == state:
+                url = cached_url[1]
+            else:
+                url = self.reverse(context)
+                self.cached_url = (state, url)
+        else:
+            url = self.reverse(context)
+
+        if self.asvar:
+            context[self.asvar] = url
+            return ''
+        else:
+            return url
+
+    def reverse(self, context):
         args = [arg.resolve(context) for arg in self.args]
         kwargs = dict([(smart_text(k, 'ascii'), v.resolve(context))
                        for k, v in self.kwargs.items()])
@@ -30,38 +68,19 @@ class URLNode(Node):
                 "'url' requires a non-empty first argument. "
                 "The syntax changed in Django 1.5, see the docs.")
 
-        # Try to look up the URL twice: once given the view name, and again
-        # relative to what we guess is the "main" app. If they both fail,
-        # re-raise the NoReverseMatch unless we're using the
-        # {% url ... as var %} construct in which case return nothing.
+        # reverse_i18n() tries fallbacks, e.g. relative to what we guess is
+        # the "main" app. If they all fail, re-raise the NoReverseMatch
+        # unless we're using the {% url ... as var %} construct in which case
+        # return nothing.
         url = ''
         try:
             url = reverse_i18n(view_name, language,
                                args=args, kwargs=kwargs,
                                current_app=context.current_app)
-        except NoReverseMatch as e:
-            if settings.SETTINGS_MODULE:
-                project_name = settings.SETTINGS_MODULE.split('.')[0]
-                try:
-                    url = reverse_i18n(project_name + '.' + view_name,
-                                       language,
-                                       args=args, kwargs=kwargs,
-                                       current_app=context.current_app)
-                except NoReverseMatch:
-                    if self.asvar is None:
-                        # Re-raise the original exception, not the one with
-                        # the path relative to the project. This makes a
-                        # better error message.
-                        raise e
-            else:
-                if self.asvar is None:
-                    raise e
-
-        if self.asvar:
-            context[self.asvar] = url
-            return ''
-        else:
-            return url
+        except NoReverseMatch:
+            if self.asvar is None:
+                raise
+        return url
 
 
 @register.tag
@@ -90,28 +109,86 @@ def i18nurl(parser, token):
 
     language = parser.compile_filter(bits[2])
 
-    args = []
-    kwargs = {}
     asvar = None
     bits = bits[3:]
     if len(bits) >= 2 and bits[-2] == 'as':
         asvar = bits[-1]
         bits = bits[:-2]
 
-    if len(bits):
-        for bit in bits:
-            match = kwarg_re.match(bit)
-            if not match:
-                raise TemplateSyntaxError("Malformed arguments to url tag")
-            name, value = match.groups()
-            if name:
-                kwargs[name] = parser.compile_filter(value)
-            else:
-                args.append(parser.compile_filter(value))
+    args, kwargs = parse_url_arguments(parser, bits)
 
     return URLNode(viewname, language, args, kwargs, asvar)
 
 
+def parse_url_arguments(parser, bits):
+    """Compile url tag arguments, return (args, kwargs)."""
+    args = []
+    kwargs = {}
+    for bit in bits:
+        match = kwarg_re.match(bit)
+        if not match:
+            raise TemplateSyntaxError("Malformed arguments to url tag")
+        name, value = match.groups()
+        if name:
+            kwargs[name] = parser.compile_filter(value)
+        else:
+            args.append(parser.compile_filter(value))
+    return args, kwargs
+
+
+class URLsNode(Node):
+    def __init__(self, view_name, args, kwargs, asvar):
+        self.view_name = view_name
+        self.args = args
+        self.kwargs = kwargs
+        self.asvar = asvar
+
+    def render(self, context):
+        args = [arg.resolve(context) for arg in self.args]
+        kwargs = dict([(smart_text(k, 'ascii'), v.resolve(context))
+                       for k, v in self.kwargs.items()])
+        view_name = self.view_name.resolve(context)
+
+        # If the lookup and its fallbacks fail, assign an empty mapping.
+        try:
+            urls = reverse_i18n_all(view_name, args=args, kwargs=kwargs,
+                                    current_app=context.current_app)
+        except NoReverseMatch:
+            urls = {}
+        context[self.asvar] = urls
+        return ''
+
+
+@register.tag
+def i18nurl_all(parser, token):
+    """
+    Assigns a mapping of languages of settings.I18N_LANGUAGES to the
+    absolute URL matching given view with its parameters in each language.
+
+        {% i18nurl_all "path.to.some_view" arg1 name1=value1 as urls %}
+        {% for language, url in urls.items %}...{% endfor %}
+
+    """
+    bits = token.split_contents()
+    if len(bits) < 4 or bits[-2] != 'as':
+        raise TemplateSyntaxError("'%s' takes at least one argument"
+                                  " (path to a view) and requires"
+                                  " 'as variable'" % bits[0])
+    viewname = parser.compile_filter(bits[1])
+    asvar = bits[-1]
+    args, kwargs = parse_url_arguments(parser, bits[2:-2])
+    return URLsNode(viewname, args, kwargs, asvar)
+
+
+def get_view_name(resolver_match):
+    """Return the name to reverse the view of resolver_match."""
+    if resolver_match.app_name:
+        return '{app_name}:{url_name}'.format(
+            app_name=resolver_match.app_name,
+            url_name=resolver_match.url_name)
+    return '{url_name}'.format(url_name=resolver_match.url_name)
+
+
 class CurrentURLNode(Node):
     def __init__(self, language, asvar):
         self.language = language
@@ -122,45 +199,24 @@ class CurrentURLNode(Node):
             resolver_match = context['request'].resolver_match
         except AttributeError:
             return ''
-        app_name = resolver_match.app_name
-        url_name = resolver_match.url_name
+        view_name = get_view_name(resolver_match)
         args = resolver_match.args
         kwargs = resolver_match.kwargs
 
         language = self.language.resolve(context)
 
-        if app_name:
-            view_name = '{app_name}:{url_name}'.format(app_name=app_name,
-                                                       url_name=url_name)
-        else:
-            view_name = '{url_name}'.format(url_name=url_name)
-
-        # Try to look up the URL twice: once given the view name, and again
-        # relative to what we guess is the "main" app. If they both fail,
-        # re-raise the NoReverseMatch unless we're using the
-        # {% url ... as var %} construct in which case return nothing.
+        # reverse_i18n() tries fallbacks, e.g. relative to what we guess is
+        # the "main" app. If they all fail, re-raise the NoReverseMatch
+        # unless we're using the {% url ... as var %} construct in which case
+        # return nothing.
         url = ''
         try:
             url = reverse_i18n(view_name, language,
                                args=args, kwargs=kwargs,
                                current_app=context.current_app)
-        except NoReverseMatch as e:
-            if settings.SETTINGS_MODULE:
-                project_name = settings.SETTINGS_MODULE.split('.')[0]
-                try:
-                    url = reverse_i18n(project_name + '.' + view_name,
-                                       language,
-                                       args=args, kwargs=kwargs,
-                                       current_app=context.current_app)
-                except NoReverseMatch:
-                    if self.asvar is None:
-                        # Re-raise the original exception, not the one with
-                        # the path relative to the project. This makes a
-                        # better error message.
-                        raise e
-            else:
-                if self.asvar is None:
-                    raise e
+        except NoReverseMatch:
+            if self.asvar is None:
+                raise
 
         if self.asvar:
             context[self.asvar] = url
@@ -192,3 +248,79 @@ def current_i18nurl(parser, token):
         bits = bits[:-2]
 
     return CurrentURLNode(language, asvar)
+
+
+def get_alternate_urls(request, current_app=None):
+    """Return an ordered mapping of languages of settings.I18N_LANGUAGES to
+    the absolute URL of request's view in each language.
+
+    The mapping is computed once per request and kept on it.
+
+    """
+    resolver_match = getattr(request, 'resolver_match', None)
+    if resolver_match is None:
+        return {}
+    alternates = getattr(request, '_i18n_alternates', None)
+    if alternates is None or alternates[0] != (resolver_match, current_app):
+        try:
+            urls = reverse_i18n_all(get_view_name(resolver_match),
+                                    args=resolver_match.args,
+                                    kwargs=resolver_match.kwargs,
+                                    current_app=current_app)
+        except NoReverseMatch:
+            urls = {}
+        for language, url in urls.items():
+            urls[language] = request.build_absolute_uri(url)
+        alternates = ((resolver_match, current_app), urls)
+        request._i18n_alternates = alternates
+    return alternates[1]
+
+
+class AlternatesNode(Node):
+    def __init__(self, asvar):
+        self.asvar = asvar
+
+    def render(self, context):
+        urls = get_alternate_urls(context.get('request'),
+                                  context.current_app)
+        if self.asvar:
+            context[self.asvar] = urls
+            return ''
+        return mark_safe('\n'.join(
+            format_html('<link rel="alternate" hreflang="{0}" href="{1}" />',
+                        language, url)
+            for language, url in urls.items()))
+
+
+@register.tag
+def i18n_alternates(parser, token):
+    """
+    Returns a ``<link rel="alternate">`` tag for the current page in each
+    language of settings.I18N_LANGUAGES.
+
+        {% i18n_alternates %}
+
+        or, to get the mapping of languages to absolute URLs
+
+        {% i18n_alternates as urls %}
+
+    """
+    bits = token.split_contents()
+    asvar = None
+    if len(bits) == 3 and bits[1] == 'as':
+        asvar = bits[2]
+    elif len(bits) != 1:
+        raise TemplateSyntaxError("'%s' takes no argument"
+                                  " but 'as variable'" % bits[0])
+    return AlternatesNode(asvar)
+
+
+@register.filter
+def language_available(language):
+    """
+    Returns True if a translation catalog exists for the language.
+
+        {% if "de"|language_available %}...{% endif %}
+
+    """
+    return is_language_available(language)
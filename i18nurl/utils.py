@@ -1,16 +1,133 @@
 import locale
+from importlib import import_module
 
-from django.utils.translation.trans_real import to_locale
+from django.utils import translation
+from django.utils.translation import trans_real
+from django.utils.translation.trans_real import check_for_language, to_locale
+
+from .cache import LRUCache
+from .settings import I18N_LANGUAGE_CACHE_SIZE
+from .signals import setting_changed
+
+
+#: Marks a missing cache entry, as None is a valid cached value.
+_missing = object()
+
+#: Memo of :func:`normalize_language`, keyed on the raw language code.
+_normalized_languages = LRUCache(I18N_LANGUAGE_CACHE_SIZE)
+
+#: Memo of :func:`is_language_supported` against settings.LANGUAGES.
+_supported_languages_cache = LRUCache(I18N_LANGUAGE_CACHE_SIZE)
+
+#: Codes of settings.LANGUAGES, built on first use.
+_supported_languages = None
+
+#: Codes having a translation catalog, built on first use.
+_available_languages = None
+
+
+def get_supported_languages():
+    """Return the set of language codes in settings.LANGUAGES."""
+    global _supported_languages
+    if _supported_languages is None:
+        from django.conf import settings
+        _supported_languages = frozenset(dict(settings.LANGUAGES).keys())
+    return _supported_languages
+
+
+def get_available_languages():
+    """Return the set of codes of settings.LANGUAGES and
+    settings.I18N_LANGUAGES for which a translation catalog exists.
+
+    Catalogs are looked up once, so that checking the availability of a
+    language doesn't hit the filesystem.
+
+    """
+    global _available_languages
+    if _available_languages is None:
+        from django.conf import settings
+        languages = dict(settings.LANGUAGES)
+        languages.update(getattr(settings, 'I18N_LANGUAGES', ()))
+        _available_languages = frozenset(
+            code for code in languages if check_for_language(code))
+    return _available_languages
+
+
+def is_language_available(language):
+    """Return True if a translation catalog exists for language."""
+    return language in get_available_languages()
+
+
+def activate_language(language):
+    """Activate language, unless its translation is already the active one.
+
+    Return True if the active translation changed. After
+    ``translation.deactivate_all()``, no real translation is active, even
+    though ``translation.get_language()`` returns settings.LANGUAGE_CODE, so
+    language is activated.
+
+    """
+    active = getattr(trans_real._active, 'value', None)
+    to_language = getattr(active, 'to_language', None)
+    if to_language is not None and to_language() == language:
+        return False
+    translation.activate(language)
+    return True
+
+
+def restore_translation(previous):
+    """Make previous, the value ``trans_real._active.value`` had, the active
+    translation again, as saved before activating a language."""
+    if previous is None:
+        translation.deactivate()
+    elif hasattr(previous, 'to_language'):
+        translation.activate(previous.to_language())
+    else:
+        translation.deactivate_all()
+
+
+class override_language(object):
+    """Context manager which activates language, then restores the previous
+    translation. Nothing is activated if language is already the active
+    one."""
+    def __init__(self, language):
+        self.language = language
+
+    def __enter__(self):
+        self.previous = getattr(trans_real._active, 'value', None)
+        self.changed = activate_language(self.language)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.changed:
+            restore_translation(self.previous)
+
+
+def import_string(dotted_path):
+    """Import a dotted module path and return the designated attribute."""
+    module_path, name = dotted_path.rsplit('.', 1)
+    return getattr(import_module(module_path), name)
 
 
 def normalize_language(language):
-    return locale.locale_alias.get(to_locale(language, True))
+    normalized = _normalized_languages.get(language, _missing)
+    if normalized is _missing:
+        normalized = locale.locale_alias.get(to_locale(language, True))
+        _normalized_languages.set(language, normalized)
+    return normalized
 
 
 def is_language_supported(language, supported_languages=None):
     if supported_languages is None:
-        from django.conf import settings
-        supported_languages = dict(settings.LANGUAGES).keys()
+        supported = _supported_languages_cache.get(language, _missing)
+        if supported is _missing:
+            supported = _is_language_supported(language,
+                                               get_supported_languages())
+            _supported_languages_cache.set(language, supported)
+        return supported
+    return _is_language_supported(language, supported_languages)
+
+
+def _is_language_supported(language, supported_languages):
     if not language:
         return None
     normalized = normalize_language(language)
@@ -22,3 +139,16 @@ def is_language_supported(language, supported_languages=None):
         if lang.lower() in supported_languages:
             return lang
     return None
+
+
+def clear_language_caches(setting, **kwargs):
+    """Reset languages and memoized lookups when language settings change."""
+    global _supported_languages, _available_languages
+    if setting == 'LANGUAGES':
+        _supported_languages = None
+        _supported_languages_cache.clear()
+    if setting in ('LANGUAGES', 'I18N_LANGUAGES', 'LOCALE_PATHS'):
+        _available_languages = None
+
+
+setting_changed.connect(clear_language_caches)
@@ -1,13 +1,14 @@
 """Views to manage active language."""
-from django.conf import settings
-from django.core.urlresolvers import reverse
 from django.http import HttpResponseRedirect
 from django.utils.http import is_safe_url
-from django.utils.translation import override
+from django.utils.translation import get_language
 from django.views.generic import FormView, RedirectView
 
+from i18nurl.backends import get_backends
 from i18nurl.settings import I18N_REDIRECT_URL_NAME
 from i18nurl.forms import LanguageSelectionForm
+from i18nurl.negotiation import get_negotiator
+from i18nurl.resolvers import reverse
 
 
 class GuessLanguageView(RedirectView):
@@ -22,8 +23,16 @@ class GuessLanguageView(RedirectView):
         default site and display a message which includes language
         selection links.
 
+        Without a language middleware, the language is negotiated with the
+        Accept-Language header.
+
         """
-        return reverse(I18N_REDIRECT_URL_NAME)
+        language = getattr(self.request, 'LANGUAGE_CODE', None)
+        if language is None:
+            language = get_negotiator().negotiate(
+                self.request.META.get('HTTP_ACCEPT_LANGUAGE', '')) \
+                or get_language()
+        return reverse(I18N_REDIRECT_URL_NAME, language)
 
 
 guess_language = GuessLanguageView.as_view()
@@ -31,7 +40,12 @@ guess_language = GuessLanguageView.as_view()
 
 class SetLanguageView(FormView):
     """Display language selection form, or, if form submitted, remember
-    selected language and redirects to the adequate URL."""
+    selected language and redirects to the adequate URL.
+
+    The language is remembered by the backends of
+    settings.I18N_LANGUAGE_BACKENDS.
+
+    """
     form_class = LanguageSelectionForm
     template_name = 'i18n/set_language.html'
 
@@ -45,23 +59,11 @@ class SetLanguageView(FormView):
         if not is_safe_url(url=redirect_url, host=self.request.get_host()):
             redirect_url = None
         if not redirect_url:
-            with override(language_code):
-                redirect_url = reverse(I18N_REDIRECT_URL_NAME)
+            redirect_url = reverse(I18N_REDIRECT_URL_NAME, language_code)
         response = HttpResponseRedirect(redirect_url)
         if remember:
-            # Write in user's profile.
-            user = self.request.user
-            if hasattr(user, 'language_code') and \
-                    user.language_code != language_code:
-                user.language_code = language_code
-                user.save()
-            # Write in session.
-            if hasattr(self.request, 'session'):
-                self.request.session['django_language'] = language_code
-            # Write in a cookie.
-            else:
-                response.set_cookie(settings.LANGUAGE_COOKIE_NAME,
-                                    language_code)
+            for backend in get_backends():
+                backend.remember(self.request, response, language_code)
         return response
 
 
@@ -0,0 +1,88 @@
+"""Pre-populate i18n caches, e.g. once in the master of a pre-fork server so
+that workers share them."""
+from timeit import default_timer
+
+from django.core.urlresolvers import NoReverseMatch, get_urlconf
+from django.utils import six
+
+from . import reverse_cache, reverse_i18n_isolated
+from .resolvers import (get_language_dicts, get_language_resolver,
+                        warm_resolvers)
+from .settings import I18N_LANGUAGES, I18N_WARMUP
+from .utils import get_available_languages, override_language
+
+
+def warmup(languages=None, urlconf=None):
+    """Warm caches of languages, which default to codes of
+    settings.I18N_LANGUAGES, phase by phase:
+
+    * ``'languages'``: the index of available languages,
+    * ``'catalogs'``: the translation catalog of each language,
+    * ``'patterns'``: URL resolvers of each language, with compiled patterns,
+    * ``'urls'``: each named URL which takes no argument, in each language,
+      if ``reverse_cache`` is enabled by settings.I18N_REVERSE_CACHE_SIZE.
+
+    Return a list of (phase, count of items warmed, duration in seconds).
+
+    """
+    if languages is None:
+        languages = [code for code, name in I18N_LANGUAGES]
+    if urlconf is None:
+        urlconf = get_urlconf()
+    timings = []
+
+    start = default_timer()
+    count = len(get_available_languages())
+    timings.append(('languages', count, default_timer() - start))
+
+    start = default_timer()
+    for language in languages:
+        with override_language(language):
+            pass
+    timings.append(('catalogs', len(languages), default_timer() - start))
+
+    start = default_timer()
+    warm_resolvers(languages, urlconf)
+    timings.append(('patterns', len(languages), default_timer() - start))
+
+    if not reverse_cache.maxsize:
+        return timings  # Reversed URLs would not be kept.
+    start = default_timer()
+    count = 0
+    for language in languages:
+        resolver = get_language_resolver(language, urlconf)
+        for name in get_url_names(resolver, resolver.language_code):
+            try:
+                reverse_i18n_isolated(name, language, urlconf)
+            except NoReverseMatch:
+                continue
+            count += 1
+    timings.append(('urls', count, default_timer() - start))
+
+    return timings
+
+
+def startup():
+    """Build the index of available languages and, if settings.I18N_WARMUP
+    is True, warm up caches of each language. Run by the app config."""
+    get_available_languages()
+    if I18N_WARMUP:
+        warmup()
+
+
+def get_url_names(resolver, language_code, namespace=''):
+    """Yield names of resolver's URLs which can be reversed without
+    arguments, prefixed by their namespaces."""
+    reverse_dict, namespace_dict, app_dict = get_language_dicts(
+        resolver, language_code)
+    for name in reverse_dict:
+        if not isinstance(name, six.string_types):
+            continue  # Views are keys too.
+        for possibilities, pattern, defaults in reverse_dict.getlist(name):
+            if any(not params for result, params in possibilities):
+                yield namespace + name
+                break
+    for ns, (prefix, sub_resolver) in namespace_dict.items():
+        for name in get_url_names(sub_resolver, language_code,
+                                  namespace + ns + ':'):
+            yield name